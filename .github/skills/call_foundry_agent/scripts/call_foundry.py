@@ -1,15 +1,193 @@
 import argparse
+import json
 import os
+import socket
+import socketserver
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from azure.identity import DefaultAzureCredential
 from azure.ai.projects import AIProjectClient
 
+import llm_cache
+
 load_dotenv()
 
+
+class FoundryAgent:
+    """Credential, project client and resolved agent reference, created once and shared by every prompt."""
+
+    def __init__(self, endpoint, agent_name):
+        self.project_client = AIProjectClient(
+            endpoint=endpoint,
+            credential=DefaultAzureCredential(),
+        )
+
+        # Get an existing agent
+        self.agent = self.project_client.agents.get(agent_name=agent_name)
+
+        self.openai_client = self.project_client.get_openai_client()
+
+    def ask(self, prompt):
+        # Reference the agent to get a response
+        return self.openai_client.responses.create(
+            input=[{"role": "user", "content": prompt}],
+            extra_body={"agent": {"name": self.agent.name, "type": "agent_reference"}},
+        )
+
+
+class PromptRunner:
+    """
+    Answers prompts from the cache or the agent. The agent is created on the
+    first cache miss, so runs served entirely from the cache never touch Azure.
+    """
+
+    def __init__(self, endpoint, agent_name, cache=None):
+        self.endpoint = endpoint
+        self.agent_name = agent_name
+        self.cache = cache
+        self.agent = None
+        self.lock = threading.Lock()
+
+    def get_agent(self):
+        with self.lock:
+            if self.agent is None:
+                self.agent = FoundryAgent(self.endpoint, self.agent_name)
+            return self.agent
+
+    def run(self, prompt):
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.key(endpoint=self.endpoint, agent=self.agent_name, prompt=prompt)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        response = self.get_agent().ask(prompt)
+        if cache_key is not None and response.status == "completed":
+            self.cache.set(cache_key, response.output_text)
+        return response.output_text
+
+
+def parse_request(line, line_number):
+    """
+    Read one JSONL request: {"id": ..., "prompt": ...}. The id defaults to
+    "line-<n>", which cannot clash with a numeric id given explicitly.
+    """
+    request = json.loads(line)
+    if not isinstance(request, dict) or not isinstance(request.get("prompt"), str):
+        raise ValueError('expected a JSON object with a "prompt" string')
+    return request.get("id", f"line-{line_number}"), request["prompt"]
+
+
+def run_batch(runner, lines, executor, write):
+    """
+    Answer JSONL requests concurrently on executor and write one JSONL result per
+    request, {"id", "output"} or {"id", "error"}, in completion order.
+    """
+    def answer(request_id, prompt):
+        try:
+            return {"id": request_id, "output": runner.run(prompt)}
+        except Exception as e:
+            return {"id": request_id, "error": str(e)}
+
+    futures = []
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            request_id, prompt = parse_request(line, line_number)
+        except ValueError as e:
+            write({"id": f"line-{line_number}", "error": f"invalid request: {e}"})
+            continue
+        futures.append(executor.submit(answer, request_id, prompt))
+    for future in as_completed(futures):
+        write(future.result())
+
+
+def serve(runner, socket_path, concurrency):
+    """
+    Run as a local daemon on a Unix socket. Each connection first sends
+    {"endpoint", "agent"}; the daemon answers {"ok": true} when they match the
+    agent it serves and {"ok": false, ...} otherwise, then closes. On a match the
+    connection sends JSONL requests, closes its writing side, and reads the JSONL
+    results; every connection shares the daemon's credential, client, agent and pool.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        print("Error: --serve needs Unix domain sockets, which this platform does not support.", file=sys.stderr)
+        sys.exit(1)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            lock = threading.Lock()
+
+            def write(result):
+                with lock:
+                    self.wfile.write((json.dumps(result) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+
+            try:
+                hello = json.loads(self.rfile.readline())
+            except ValueError:
+                hello = {}
+            if not isinstance(hello, dict) or (hello.get("endpoint"), hello.get("agent")) != (runner.endpoint, runner.agent_name):
+                write({"ok": False, "endpoint": runner.endpoint, "agent": runner.agent_name})
+                return
+            write({"ok": True})
+            run_batch(runner, (line.decode("utf-8") for line in self.rfile), executor, write)
+
+    with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+        print(f"Serving agent {runner.agent_name} on {socket_path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            executor.shutdown()
+            os.unlink(socket_path)
+
+
+def ask_daemon(socket_path, lines, endpoint, agent_name):
+    """
+    Send JSONL requests to a running daemon and yield its results.
+
+    Returns None when no daemon is listening or when it serves a different
+    agent or endpoint, so the caller runs the prompts itself.
+    """
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+        return None
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except OSError:
+        connection.close()
+        return None
+
+    reader = connection.makefile("rb")
+    connection.sendall((json.dumps({"endpoint": endpoint, "agent": agent_name}) + "\n").encode("utf-8"))
+    reply = json.loads(reader.readline() or "{}")
+    if not reply.get("ok"):
+        print(f"Daemon on {socket_path} serves agent {reply.get('agent')} at {reply.get('endpoint')}; "
+              "running the prompts in process instead.", file=sys.stderr)
+        reader.close()
+        connection.close()
+        return None
+
+    def results():
+        with connection, reader:
+            connection.sendall("".join(line if line.endswith("\n") else line + "\n" for line in lines).encode("utf-8"))
+            connection.shutdown(socket.SHUT_WR)
+            for line in reader:
+                yield json.loads(line)
+
+    return results()
+
+
 def main():
     parser = argparse.ArgumentParser(description="Call an Azure Foundry Agent.")
-    parser.add_argument("prompt", help="The prompt to send to the agent.")
+    parser.add_argument("prompt", nargs="?", help="The prompt to send to the agent.")
     parser.add_argument(
         "--agent-name",
         default=os.environ.get("AZURE_AI_AGENT_NAME"),
@@ -20,35 +198,94 @@ def main():
         default=os.environ.get("AZURE_AI_PROJECT_ENDPOINT"),
         help="The Azure AI Project Endpoint. Defaults to AZURE_AI_PROJECT_ENDPOINT environment variable.",
     )
+    parser.add_argument(
+        "--cache-dir",
+        help="Cache agent responses in this directory. Defaults to LLM_CACHE_DIR; caching is off when neither is set.",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        help="Seconds a cached response stays valid. Defaults to LLM_CACHE_TTL or 7 days.",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        help="Cache size above which least recently used entries are evicted. Defaults to LLM_CACHE_MAX_MB or 50.",
+    )
+    parser.add_argument(
+        "--batch",
+        help='Read JSONL requests ({"id": ..., "prompt": ...}) from this file, or "-" for stdin, '
+             "and print JSONL results in completion order.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Prompts sent to the agent at the same time in batch and daemon mode.",
+    )
+    parser.add_argument(
+        "--socket",
+        default=os.environ.get("FOUNDRY_AGENT_SOCKET"),
+        help="Unix socket of a running daemon to use when it is listening. Defaults to FOUNDRY_AGENT_SOCKET.",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a daemon listening on --socket instead of answering a prompt.",
+    )
 
     args = parser.parse_args()
 
+    if not args.prompt and not args.batch and not args.serve:
+        parser.error("a prompt, --batch or --serve is required")
+    if args.serve and not args.socket:
+        parser.error("--serve needs --socket or FOUNDRY_AGENT_SOCKET")
+
+    if args.batch:
+        source = sys.stdin if args.batch == "-" else open(args.batch, "r", encoding="utf-8")
+        with source:
+            lines = list(source)
+    else:
+        lines = [json.dumps({"id": 1, "prompt": args.prompt})] if args.prompt else []
+
+    # a running daemon already holds the credential, client and agent
+    if args.socket and not args.serve:
+        results = ask_daemon(args.socket, lines, args.endpoint, args.agent_name)
+        if results is not None:
+            for result in results:
+                if args.batch:
+                    print(json.dumps(result), flush=True)
+                elif "error" in result:
+                    print(f"Error: {result['error']}", file=sys.stderr)
+                    sys.exit(1)
+                else:
+                    print(result["output"])
+            return
+
     if not args.endpoint:
         print("Error: Azure AI Project Endpoint is required. Set AZURE_AI_PROJECT_ENDPOINT env var or use --endpoint.", file=sys.stderr)
         sys.exit(1)
-    
+
     if not args.agent_name:
         print("Error: Agent Name is required. Set AZURE_AI_AGENT_NAME env var or use --agent-name.", file=sys.stderr)
         sys.exit(1)
 
-    try:
-        project_client = AIProjectClient(
-            endpoint=args.endpoint,
-            credential=DefaultAzureCredential(),
-        )
-
-        # Get an existing agent
-        agent = project_client.agents.get(agent_name=args.agent_name)
+    cache = llm_cache.from_env(args.cache_dir, args.cache_ttl, args.cache_max_mb)
+    runner = PromptRunner(args.endpoint, args.agent_name, cache)
 
-        openai_client = project_client.get_openai_client()
+    if args.serve:
+        # resolve the agent up front so the first request does not pay for it
+        runner.get_agent()
+        serve(runner, args.socket, args.concurrency)
+        return
 
-        # Reference the agent to get a response
-        response = openai_client.responses.create(
-            input=[{"role": "user", "content": args.prompt}],
-            extra_body={"agent": {"name": agent.name, "type": "agent_reference"}},
-        )
+    if args.batch:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            run_batch(runner, lines, executor, lambda result: print(json.dumps(result), flush=True))
+        return
 
-        print(response.output_text)
+    try:
+        print(runner.run(args.prompt))
 
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+
+class LLMCache:
+    """
+    Content-addressed on-disk cache for model responses.
+
+    Entries are JSON files named by the SHA-256 of everything that determines the
+    response (endpoint, model or agent, prompts, parameters). Each entry is written
+    to a temporary file and renamed into place, so concurrent writers never expose
+    a partial entry. Reads refresh the file's mtime, which orders LRU eviction once
+    the directory exceeds max_bytes; entries older than ttl seconds are ignored.
+    """
+
+    def __init__(self, directory: str, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(**parts: Any) -> str:
+        """Hash the request parts into a cache key; the order of the arguments does not matter."""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached text for key, or None when it is missing or expired."""
+        path = self._path(key)
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if time.time() - entry.get("created", 0) > self.ttl:
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return entry["value"]
+
+    def set(self, key: str, value: str) -> None:
+        """Store value for key atomically, then evict the least recently used entries above max_bytes."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"created": time.time(), "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for path in self.directory.glob("*.json"):
+            if path.name.startswith(".tmp-"):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # removed by a concurrent writer's eviction
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def from_env(directory: Optional[str] = None, ttl: Optional[float] = None,
+             max_mb: Optional[float] = None) -> Optional[LLMCache]:
+    """
+    Build the cache from explicit options or the LLM_CACHE_DIR, LLM_CACHE_TTL and
+    LLM_CACHE_MAX_MB environment variables; None (no caching) when no directory is set.
+    """
+    directory = directory or os.environ.get("LLM_CACHE_DIR")
+    if not directory:
+        return None
+    ttl = ttl if ttl is not None else float(os.environ.get("LLM_CACHE_TTL", DEFAULT_TTL))
+    max_mb = max_mb if max_mb is not None else float(os.environ.get("LLM_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 / 1024))
+    return LLMCache(directory, ttl, int(max_mb * 1024 * 1024))
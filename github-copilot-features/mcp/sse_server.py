@@ -1,79 +1,580 @@
 import logging
+import logging.handlers
+import atexit
+import copy
+import os
+import queue
+import argparse
+import multiprocessing
+import socket
 import uvicorn
 from starlette.applications import Starlette
 from pathlib import Path
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
 from starlette.routing import Route
 from mcp.server import Server
 from mcp.server.sse import SseServerTransport
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
 from mcp.types import Tool, TextContent, ImageContent, EmbeddedResource
 import json
-from typing import Any, Sequence, Union, Dict, TypeVar, cast
+from typing import Any, Sequence, Union, Dict, Hashable, Optional, TypeVar, cast
 import asyncio
+import contextlib
+import importlib.util
+import random
+import time
+from email.utils import parsedate_to_datetime
+from bisect import bisect_left
+from collections import OrderedDict, deque
 from urllib.parse import quote_plus
 import httpx
 
-# Create logs directory if it doesn't exist
-log_dir = Path("logs")
-log_dir.mkdir(exist_ok=True)
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[logging.FileHandler("logs/mcp_server.log"), logging.StreamHandler()]
-)
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue records for a listener in the same process. Unlike QueueHandler, the
+    exc_info is kept rather than folded into the message, so each handler's
+    formatter renders the traceback itself.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(level: Optional[str] = None, json_format: Optional[bool] = None) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a queue so file and console I/O happen off the event loop.
+
+    Args:
+        level: log level name; defaults to MCP_LOG_LEVEL or INFO
+        json_format: emit JSON lines; defaults to MCP_LOG_JSON=1
+
+    Returns:
+        The started QueueListener, stopped automatically at exit
+    """
+    level = (level or os.environ.get("MCP_LOG_LEVEL", "INFO")).upper()
+    if json_format is None:
+        json_format = os.environ.get("MCP_LOG_JSON", "").lower() in ("1", "true", "yes")
+
+    # Create logs directory if it doesn't exist
+    log_dir = Path("logs")
+    log_dir.mkdir(exist_ok=True)
+
+    formatter = JsonLogFormatter() if json_format else logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+    handlers = [logging.FileHandler(log_dir / "mcp_server.log"), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [LocalQueueHandler(log_queue)]
+    root.setLevel(level)
+    return listener
+
+
+log_listener = configure_logging()
 logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
 
+# Tools served by MCP_Server; anything else is reported as "unknown" in metrics
+TOOL_NAMES = ("get_current_weather", "get_current_weather_many", "create_random_user")
+
+# Upper bound on locations accepted by get_current_weather_many
+MAX_BATCH_LOCATIONS = 100
+
+# randomuser.me returns at most this many users per request
+MAX_USERS_PER_CALL = 5000
+
+# Genders and nationality codes randomuser.me accepts; the user pool keeps one buffer per combination
+GENDERS = ["male", "female"]
+NATIONALITIES = ["au", "br", "ca", "ch", "de", "dk", "es", "fi", "fr", "gb", "ie",
+                 "in", "ir", "mx", "nl", "no", "nz", "rs", "tr", "ua", "us"]
+
+# Sections of the compact forecast returned for detail="summary"
+SUMMARY_FIELDS = ["location", "current", "daily"]
+
+
+def dumps_compact(data: Any) -> str:
+    """Serialize data to compact JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+# HTTP/2 is only negotiated when the optional `h2` package is installed
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def create_http_client(timeout: float = 10.0) -> httpx.AsyncClient:
+    """Create the long-lived, connection-pooled client shared by all tools."""
+    return httpx.AsyncClient(
+        timeout=timeout,
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=100,
+            max_keepalive_connections=20,
+            keepalive_expiry=30.0
+        )
+    )
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting the least recently used entry if full."""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for tuning the TTL."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key onto one in-flight task."""
+
+    def __init__(self):
+        self.shared = 0
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, factory) -> Any:
+        """Await the task running for key, starting factory() if there is none."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.shared += 1
+        # Shield so one cancelled caller does not cancel the result for the others
+        return await asyncio.shield(task)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; observe() is O(log buckets) with no allocation per call."""
+
+    def __init__(self, buckets: Sequence[float] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)):
+        self.buckets = tuple(buckets)
+        # label -> [per-bucket counts (last slot is +Inf), sum, count]
+        self.series: Dict[Hashable, list] = {}
+
+    def observe(self, label: Hashable, value: float) -> None:
+        series = self.series.get(label)
+        if series is None:
+            series = self.series[label] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+
+class Metrics:
+    """In-process counters and histograms rendered in Prometheus text format on scrape."""
+
+    def __init__(self):
+        self.active_sessions = 0
+        self.tool_calls: Dict[str, int] = {}
+        self.tool_errors: Dict[str, int] = {}
+        self.retries: Dict[str, int] = {}
+        self.circuit_rejections: Dict[str, int] = {}
+        self.tool_latency = Histogram()
+        self.upstream_latency = Histogram()
+
+    @staticmethod
+    def inc(counter: Dict[str, int], label: str) -> None:
+        counter[label] = counter.get(label, 0) + 1
+
+    def render(self, caches: Dict[str, TTLCache], single_flight: Optional[SingleFlight] = None) -> str:
+        """Format every series; all string formatting happens here, never on the hot path."""
+        lines = [
+            "# TYPE mcp_active_sse_sessions gauge",
+            f"mcp_active_sse_sessions {self.active_sessions}",
+        ]
+        for metric, label, counter in (
+            ("mcp_tool_calls_total", "tool", self.tool_calls),
+            ("mcp_tool_errors_total", "tool", self.tool_errors),
+            ("mcp_upstream_retries_total", "upstream", self.retries),
+            ("mcp_upstream_circuit_rejections_total", "upstream", self.circuit_rejections),
+        ):
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(f'{metric}{{{label}="{key}"}} {value}' for key, value in counter.items())
+        for metric, label, histogram in (
+            ("mcp_tool_duration_seconds", "tool", self.tool_latency),
+            ("mcp_upstream_duration_seconds", "upstream", self.upstream_latency),
+        ):
+            lines.append(f"# TYPE {metric} histogram")
+            for key, (counts, total, count) in histogram.series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{metric}_bucket{{{label}="{key}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{label}="{key}",le="+Inf"}} {count}')
+                lines.append(f'{metric}_sum{{{label}="{key}"}} {total}')
+                lines.append(f'{metric}_count{{{label}="{key}"}} {count}')
+        lines.append("# TYPE mcp_cache_hits_total counter")
+        lines.extend(f'mcp_cache_hits_total{{cache="{name}"}} {cache.hits}' for name, cache in caches.items())
+        lines.append("# TYPE mcp_cache_misses_total counter")
+        lines.extend(f'mcp_cache_misses_total{{cache="{name}"}} {cache.misses}' for name, cache in caches.items())
+        lines.append("# TYPE mcp_cache_hit_ratio gauge")
+        lines.extend(
+            f'mcp_cache_hit_ratio{{cache="{name}"}} {cache.stats()["hit_ratio"]}' for name, cache in caches.items()
+        )
+        if single_flight is not None:
+            lines.append("# TYPE mcp_coalesced_calls_total counter")
+            lines.append(f"mcp_coalesced_calls_total {single_flight.shared}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling upstream while a host's circuit is open."""
+
+
+class CircuitBreaker:
+    """Open after consecutive failures, then let one probe through after a cool-down."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.probing or time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        # Half-open: a single caller probes whether the host has recovered
+        self.probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def release(self) -> None:
+        """Give up the probe slot without a verdict, e.g. when the probe was cancelled."""
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class ResilientClient:
+    """
+    Retry transient upstream failures with full-jitter backoff inside an overall
+    deadline, honoring Retry-After, behind a per-host circuit breaker.
+    """
+
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 deadline: float = 20.0, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        """Parse Retry-After given either as seconds or as an HTTP date."""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    async def request(self, client: httpx.AsyncClient, method: str, url: str, upstream: str,
+                      max_attempts: Optional[int] = None, timeout: Optional[float] = None,
+                      **kwargs) -> httpx.Response:
+        """
+        Send a request, retrying connection errors and 429/5xx responses.
+
+        Args:
+            client: client used to send the request
+            method: HTTP method
+            url: request URL
+            upstream: bounded label used for metrics
+            max_attempts: overrides the default attempt count
+            timeout: per-attempt timeout, further capped by the remaining deadline
+
+        Returns:
+            The first non-retryable response; other 4xx responses are returned as-is
+
+        Raises:
+            CircuitOpenError: the host's circuit is open
+            httpx.HTTPStatusError: still failing when attempts or the deadline run out
+            httpx.RequestError: still unreachable when attempts or the deadline run out
+        """
+        breaker = self.breaker(httpx.URL(url).host)
+        attempts = max_attempts or self.max_attempts
+        deadline = time.monotonic() + self.deadline
+
+        for attempt in range(attempts):
+            if not breaker.allow():
+                metrics.inc(metrics.circuit_rejections, upstream)
+                raise CircuitOpenError(f"Circuit open for {upstream}; failing fast")
+
+            remaining = deadline - time.monotonic()
+            started = time.perf_counter()
+            retry_after = None
+            try:
+                response = await client.request(
+                    method, url, timeout=min(timeout or remaining, remaining), **kwargs
+                )
+            except httpx.RequestError as e:
+                breaker.record_failure()
+                error: Exception = e
+            except BaseException:
+                # cancelled (e.g. by asyncio.wait_for); let the next caller probe instead of staying open
+                breaker.release()
+                raise
+            else:
+                if response.status_code not in self.RETRY_STATUSES:
+                    breaker.record_success()
+                    return response
+                breaker.record_failure()
+                retry_after = self._retry_after(response)
+                error = httpx.HTTPStatusError(
+                    f"Server error '{response.status_code}' for url '{url}'",
+                    request=response.request,
+                    response=response
+                )
+            finally:
+                metrics.upstream_latency.observe(upstream, time.perf_counter() - started)
+
+            # Full jitter spreads retries from concurrent callers instead of synchronizing them
+            delay = retry_after if retry_after is not None else random.uniform(
+                0, min(self.max_delay, self.base_delay * 2 ** attempt)
+            )
+            if attempt == attempts - 1 or delay >= deadline - time.monotonic():
+                logger.error("%s failed after %d attempts: %s", upstream, attempt + 1, error)
+                raise error
+            logger.warning("%s failed on attempt %d/%d: %s. Retrying in %.2fs...",
+                           upstream, attempt + 1, attempts, error, delay)
+            metrics.inc(metrics.retries, upstream)
+            await asyncio.sleep(delay)
+
+
 class Weather:
-    def __init__(self, locale: str = 'en', unit: str = 'imperial', timeout: float = 10.0):
+    def __init__(self, locale: str = 'en', unit: str = 'imperial', timeout: float = 10.0,
+                 client: Optional[httpx.AsyncClient] = None, cache: Optional[TTLCache] = None,
+                 resilience: Optional[ResilientClient] = None):
         self.locale = locale
         self.unit = unit
         self.timeout = timeout
+        self.client = client
+        self.cache = cache
+        self.resilience = resilience or ResilientClient()
+
+    async def get_forecast(self, location: str, detail: str = "full",
+                           fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        Get weather forecast for a specified location.
+
+        Args:
+            location: The location to get the weather for
+            detail: "full" for the raw wttr.in document, "summary" for the compact projection
+            fields: optional subset of SUMMARY_FIELDS to keep when detail is "summary"
+
+        Returns:
+            Dictionary containing the forecast
+        """
+        cache_key = (" ".join(location.split()).casefold(), self.locale)
+        entry = self.cache.get(cache_key) if self.cache is not None else None
+        if entry is not None:
+            logger.info("Serving cached weather data for location: %s", location)
+        else:
+            url = f'https://{self.locale}.wttr.in/{quote_plus(location)}?format=j1'
+            logger.info("Requesting weather data for location: %s", location)
+            forecast = await self._fetch_url(url)
+            entry = {"full": forecast}
+            if self.cache is not None:
+                self.cache.set(cache_key, entry)
+
+        if detail == "full":
+            return entry["full"]
+        if "summary" not in entry:
+            # Project on the first summary request and keep it, so later cache hits never re-walk the full document
+            entry["summary"] = self.summarize(entry["full"])
+        if fields:
+            return {key: value for key, value in entry["summary"].items() if key in fields}
+        return entry["summary"]
+
+    def summarize(self, forecast: Dict[str, Any]) -> Dict[str, Any]:
+        """Project a wttr.in j1 document down to current conditions and a daily summary."""
+        temp = 'C' if self.unit == 'metric' else 'F'
+        speed = 'Kmph' if self.unit == 'metric' else 'Miles'
 
-    async def get_forecast(self, location: str) -> Dict[str, Any]:
-        """Get weather forecast for a specified location."""
-        url = f'https://{self.locale}.wttr.in/{quote_plus(location)}?format=j1'
-        logger.info(f"Requesting weather data for location: {location}")
-        return await self._fetch_url(url)
+        def text(entries: Any) -> Optional[str]:
+            return entries[0].get("value") if entries else None
+
+        def description(item: Dict[str, Any]) -> Optional[str]:
+            return text(item.get(f"lang_{self.locale}")) or text(item.get("weatherDesc"))
+
+        def percent(value: Any) -> int:
+            try:
+                return int(value or 0)
+            except (TypeError, ValueError):
+                return 0
+
+        area = (forecast.get("nearest_area") or [{}])[0]
+        current = (forecast.get("current_condition") or [{}])[0]
+        daily = []
+        for day in forecast.get("weather", []):
+            hourly = day.get("hourly") or []
+            # wttr.in reports 3-hourly slots; the midday slot best describes the day
+            midday = hourly[len(hourly) // 2] if hourly else {}
+            daily.append({
+                "date": day.get("date"),
+                "max_temp": day.get(f"maxtemp{temp}"),
+                "min_temp": day.get(f"mintemp{temp}"),
+                "description": description(midday),
+                "chance_of_rain": max((percent(h.get("chanceofrain")) for h in hourly), default=None),
+                "uv_index": day.get("uvIndex"),
+                "sun_hours": day.get("sunHour"),
+            })
+
+        return {
+            "location": {
+                "name": text(area.get("areaName")),
+                "region": text(area.get("region")),
+                "country": text(area.get("country")),
+            },
+            "current": {
+                "observed_at": current.get("localObsDateTime"),
+                "description": description(current),
+                "temp": current.get(f"temp_{temp}"),
+                "feels_like": current.get(f"FeelsLike{temp}"),
+                "humidity": current.get("humidity"),
+                "wind_speed": current.get(f"windspeed{speed}"),
+                "wind_dir": current.get("winddir16Point"),
+                "precip_mm": current.get("precipMM"),
+                "uv_index": current.get("uvIndex"),
+            },
+            "daily": daily,
+            "unit": self.unit,
+        }
+
+    @contextlib.asynccontextmanager
+    async def _client(self):
+        """Yield the shared client, or a throwaway one when none was provided."""
+        if self.client is not None:
+            yield self.client
+        else:
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                yield client
 
     async def _fetch_url(self, url: str, raw: bool = False, max_retries: int = 3) -> Dict[str, Any]:
-        """Fetch data from URL with retry logic and proper error handling."""
+        """Fetch data from URL through the shared retry and circuit-breaker policy."""
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:131.0) Gecko/20100101 Firefox/131.0',
             'Content-Type': 'application/json'
         }
 
-        for attempt in range(max_retries):
-            try:
-                async with httpx.AsyncClient(timeout=self.timeout) as client:
-                    response = await client.get(url, headers=headers)
-                    
-                    # Log response details at debug level instead of info to avoid excessive logging
-                    logger.debug(f"Response from {url}: status={response.status_code}")
-                    
-                    # Handle special case for 404 responses that still contain valid content
-                    if response.status_code == 404 and response.text:
-                        logger.warning(f'Got 404 but received content from URL: {url}')
-                        return self._process_response(response, raw, url)
-                    
-                    # Handle other status codes
-                    response.raise_for_status()
-                    return self._process_response(response, raw, url)
-                    
-            except httpx.HTTPStatusError as e:
-                if attempt == max_retries - 1:
-                    logger.error(f'HTTP error occurred after {max_retries} attempts: {e}')
-                    raise
-                logger.warning(f'HTTP error on attempt {attempt+1}/{max_retries}: {e}. Retrying...')
-                await asyncio.sleep(1 * (2 ** attempt))  # Better exponential backoff
-            except httpx.RequestError as e:
-                logger.error(f'Request error for {url}: {e}')
-                raise
-            except Exception as e:
-                logger.error(f'Unexpected error fetching {url}: {e}', exc_info=True)
-                raise
+        try:
+            async with self._client() as client:
+                response = await self.resilience.request(
+                    client, "GET", url, upstream="wttr.in", max_attempts=max_retries,
+                    timeout=self.timeout, headers=headers
+                )
+
+            # Log response details at debug level instead of info to avoid excessive logging
+            logger.debug("Response from %s: status=%s", url, response.status_code)
+
+            # Handle special case for 404 responses that still contain valid content
+            if response.status_code == 404 and response.text:
+                logger.warning('Got 404 but received content from URL: %s', url)
+                return self._process_response(response, raw, url)
+
+            # Handle other status codes
+            response.raise_for_status()
+            return self._process_response(response, raw, url)
+
+        except (CircuitOpenError, httpx.HTTPError) as e:
+            logger.error('Request error for %s: %s', url, e)
+            raise
+        except Exception as e:
+            logger.error('Unexpected error fetching %s: %s', url, e, exc_info=True)
+            raise
 
     def _process_response(self, response: httpx.Response, raw: bool, url: str) -> Dict[str, Any]:
         """Process HTTP response and return formatted content."""
@@ -88,23 +589,30 @@ class Weather:
                 content = content.decode('utf-8')
             return json.loads(content)
         except json.JSONDecodeError:
-            logger.error(f"Failed to decode JSON from {url}")
+            logger.error("Failed to decode JSON from %s", url)
             raise ValueError(f"Invalid JSON response from weather service: {content[:100]}...")
         except Exception as e:
-            logger.error(f"Error formatting content from {url}: {str(e)}")
+            logger.error("Error formatting content from %s: %s", url, e)
             raise ValueError(f"Failed to process weather data: {str(e)}")
 
 
 class UserGenerator:
     """Class for generating random user data"""
-    
-    async def generate_user(self, gender=None, nationality=None) -> dict:
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None,
+                 resilience: Optional[ResilientClient] = None):
+        self.client = client
+        self.resilience = resilience or ResilientClient()
+
+    async def generate_user(self, gender=None, nationality=None, seed=None, results=1) -> dict:
         """
         Generate random user data.
         
         Args:
             gender: gender for the user
             nationality: nationality for the user
+            seed: seed that makes the API return the same user every time
+            results: number of users to return in one request
         
         Returns:
             Dictionary containing random user data
@@ -117,31 +625,201 @@ class UserGenerator:
             params.append(f"gender={gender}")
         if nationality:
             params.append(f"nat={nationality}")
+        if seed:
+            params.append(f"seed={quote_plus(str(seed))}")
+        if results > 1:
+            params.append(f"results={results}")
             
         if params:
             url += "?" + "&".join(params)
             
-        logger.info(f"Calling Random User API: {url}")
+        logger.info("Calling Random User API: %s", url)
         
-        # Call API
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url)
-                response.raise_for_status()
-                data = response.json()
-                logger.info("Successfully retrieved random user data")
-                return data
-            except Exception as e:
-                logger.error(f"Error generating random user: {str(e)}")
-                raise RuntimeError(f"Random User API error: {str(e)}")
+        # Call API, reusing the shared connection pool when available
+        try:
+            if self.client is not None:
+                response = await self.resilience.request(self.client, "GET", url, upstream="randomuser.me")
+            else:
+                async with httpx.AsyncClient() as client:
+                    response = await self.resilience.request(client, "GET", url, upstream="randomuser.me")
+            response.raise_for_status()
+            data = response.json()
+            logger.info("Successfully retrieved random user data")
+            return data
+        except Exception as e:
+            logger.error("Error generating random user: %s", e)
+            raise RuntimeError(f"Random User API error: {str(e)}")
+
+
+class UserPool:
+    """
+    Per-(gender, nationality) buffers of random users, fetched in bulk and refilled
+    in the background whenever a buffer drops below the low watermark. Only the
+    genders and nationality codes randomuser.me knows get a buffer, so the number
+    of buffers is bounded.
+    """
+
+    def __init__(self, generator: UserGenerator, batch_size: int = 200,
+                 low_watermark: int = 50, max_size: int = 500):
+        self.generator = generator
+        self.batch_size = batch_size
+        self.low_watermark = low_watermark
+        self.max_size = max_size
+        self._buffers: Dict[tuple, deque] = {}
+        self._refills: Dict[tuple, asyncio.Task] = {}
+
+    async def take(self, count: int = 1, gender=None, nationality=None) -> list[dict]:
+        """Return count users, waiting for a refill only when the buffer is empty."""
+        if gender is not None and gender not in GENDERS:
+            raise ValueError(f"'gender' must be one of {', '.join(GENDERS)}")
+        if nationality is not None and nationality not in NATIONALITIES:
+            raise ValueError(f"'nationality' must be one of {', '.join(NATIONALITIES)}")
+        if count >= self.batch_size:
+            # Large requests go straight upstream instead of draining the pool
+            data = await self.generator.generate_user(gender, nationality, results=count)
+            return data.get("results", [])
+
+        key = (gender, nationality)
+        buffer = self._buffers.setdefault(key, deque(maxlen=self.max_size))
+        users = []
+        while len(users) < count:
+            # Concurrent callers may drain a refill before we run, so keep refilling
+            # until we get users or upstream comes back empty
+            while not buffer:
+                if not await self._refill(key):
+                    raise RuntimeError("Random User API returned no users")
+            users.append(buffer.popleft())
+
+        if len(buffer) < self.low_watermark:
+            self._refill(key)
+        return users
+
+    def _refill(self, key: tuple) -> asyncio.Task:
+        """Start (or join) the refill task for key."""
+        task = self._refills.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fill(key))
+            self._refills[key] = task
+            task.add_done_callback(lambda t: self._refill_done(key, t))
+        return task
+
+    def _refill_done(self, key: tuple, task: asyncio.Task) -> None:
+        self._refills.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Background user pool refill failed for %s: %s", key, task.exception())
+
+    async def _fill(self, key: tuple) -> int:
+        """Fetch one bulk batch into the buffer and return how many users were added."""
+        buffer = self._buffers[key]
+        wanted = min(self.batch_size, self.max_size - len(buffer))
+        if wanted <= 0:
+            return len(buffer)
+        gender, nationality = key
+        data = await self.generator.generate_user(gender, nationality, results=wanted)
+        users = data.get("results", [])
+        buffer.extend(users)
+        logger.debug("Refilled user pool %s to %d users", key, len(buffer))
+        return len(users)
 
 
 class MCP_Server:
-    def __init__(self):
+    def __init__(self, cache_ttl: float = 600.0, cache_size: int = 256):
         logger.debug("Initializing MCP_Server")
         self.app = Server("mcp-server")
+        # One pooled client and one forecast cache shared by every tool call
+        self.http_client = create_http_client()
+        self.weather_cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        # Shared so both tools see the same per-host circuit state
+        self.resilience = ResilientClient()
+        self.weather = Weather(locale='zh-cn', unit='metric', client=self.http_client,
+                               cache=self.weather_cache, resilience=self.resilience)
+        self.user_generator = UserGenerator(client=self.http_client, resilience=self.resilience)
+        self.user_pool = UserPool(self.user_generator)
+        self.single_flight = SingleFlight()
         self.setup_tools()
 
+    async def aclose(self):
+        """Close the shared HTTP client."""
+        await self.http_client.aclose()
+
+    async def get_forecasts(self, locations: Sequence[str], max_concurrency: int = 8,
+                            item_timeout: float = 15.0, detail: str = "full",
+                            fields: Optional[Sequence[str]] = None, on_result=None) -> Dict[str, Any]:
+        """
+        Fetch forecasts for many locations concurrently.
+
+        Args:
+            locations: locations to fetch; duplicates are fetched once
+            max_concurrency: maximum number of upstream fetches in flight
+            item_timeout: seconds allowed for each location
+            detail: "full" or "summary", as for Weather.get_forecast
+            fields: optional subset of SUMMARY_FIELDS for summaries
+            on_result: optional coroutine function called as each location finishes
+
+        Returns:
+            Dictionary with per-location "results" and "errors"
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch(location: str) -> tuple[str, Any, Optional[str]]:
+            async with semaphore:
+                try:
+                    forecast = await asyncio.wait_for(
+                        self.weather.get_forecast(location, detail=detail, fields=fields), item_timeout
+                    )
+                    return location, forecast, None
+                except asyncio.TimeoutError:
+                    return location, None, f"Timed out after {item_timeout}s"
+                except Exception as e:
+                    return location, None, str(e)
+
+        results: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        tasks = [fetch(location) for location in dict.fromkeys(locations)]
+        for done, future in enumerate(asyncio.as_completed(tasks), 1):
+            location, forecast, error = await future
+            if error is None:
+                results[location] = forecast
+            else:
+                logger.warning("Weather request failed for location %s: %s", location, error)
+                errors[location] = error
+            if on_result is not None:
+                await on_result(done, len(tasks), location, forecast, error)
+        return {"results": results, "errors": errors}
+
+    async def _send_partial_result(self, done: int, total: int, location: str,
+                                   forecast: Any, error: Optional[str]) -> None:
+        """Stream one finished batch item to the client as a progress notification."""
+        try:
+            ctx = self.app.request_context
+        except LookupError:
+            return
+        progress_token = ctx.meta.progressToken if ctx.meta else None
+        if progress_token is None:
+            return
+        item = {"location": location, "error": error} if error else {"location": location, "result": forecast}
+        await ctx.session.send_progress_notification(
+            progress_token, done, total=total, message=dumps_compact(item), related_request_id=str(ctx.request_id)
+        )
+
+    @staticmethod
+    def _flight_key(name: str, arguments: Any) -> Optional[Hashable]:
+        """Return the coalescing key for a tool call, or None if it must not be shared."""
+        if not isinstance(arguments, dict):
+            return None
+        if name == "get_current_weather":
+            location = arguments.get("location_name")
+            if not isinstance(location, str):
+                return None
+            arguments = {**arguments, "location_name": " ".join(location.split()).casefold()}
+        elif name == "create_random_user":
+            # Random users are only interchangeable when the caller opts in
+            if not arguments.get("seed") and not arguments.get("batch"):
+                return None
+        else:
+            return None
+        return (name, json.dumps(arguments, sort_keys=True, separators=(",", ":")))
+
     def setup_tools(self):
         @self.app.list_tools()
         async def list_tools() -> list[Tool]:
@@ -155,11 +833,67 @@ class MCP_Server:
                             "location_name": {
                                 "type": "string",
                                 "description": "The location to get the weather for"
+                            },
+                            "detail": {
+                                "type": "string",
+                                "enum": ["summary", "full"],
+                                "default": "full",
+                                "description": "'summary' returns compact current conditions and daily summary; 'full' returns the raw forecast"
+                            },
+                            "fields": {
+                                "type": "array",
+                                "items": {"type": "string", "enum": SUMMARY_FIELDS},
+                                "description": "Sections of the summary to return; defaults to all"
                             }
                         },
                         "required": ["location_name"]
                     }
                 ),
+                Tool(
+                    name="get_current_weather_many",
+                    description="Get current weather and forecast for many locations in one call",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "locations": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "minItems": 1,
+                                "maxItems": MAX_BATCH_LOCATIONS,
+                                "description": "The locations to get the weather for"
+                            },
+                            "max_concurrency": {
+                                "type": "integer",
+                                "minimum": 1,
+                                "default": 8,
+                                "description": "Maximum number of locations fetched at the same time"
+                            },
+                            "timeout": {
+                                "type": "number",
+                                "exclusiveMinimum": 0,
+                                "default": 15,
+                                "description": "Seconds allowed for each location"
+                            },
+                            "stream": {
+                                "type": "boolean",
+                                "default": False,
+                                "description": "Send each result as a progress notification as soon as it finishes"
+                            },
+                            "detail": {
+                                "type": "string",
+                                "enum": ["summary", "full"],
+                                "default": "full",
+                                "description": "'summary' returns compact current conditions and daily summary; 'full' returns the raw forecast"
+                            },
+                            "fields": {
+                                "type": "array",
+                                "items": {"type": "string", "enum": SUMMARY_FIELDS},
+                                "description": "Sections of the summary to return; defaults to all"
+                            }
+                        },
+                        "required": ["locations"]
+                    }
+                ),
                 Tool(
                     name="create_random_user",
                     description="Generate random user data",
@@ -168,8 +902,28 @@ class MCP_Server:
                         "properties": {
                             "gender": {
                                 "type": "string",
-                                "enum": ["male", "female"],
+                                "enum": GENDERS,
                                 "description": "gender for the user"
+                            },
+                            "nationality": {
+                                "type": "string",
+                                "enum": NATIONALITIES,
+                                "description": "optional nationality code for the user, e.g. 'us', 'gb', 'fr'"
+                            },
+                            "count": {
+                                "type": "integer",
+                                "minimum": 1,
+                                "maximum": MAX_USERS_PER_CALL,
+                                "default": 1,
+                                "description": "number of users to return"
+                            },
+                            "seed": {
+                                "type": "string",
+                                "description": "optional seed; calls with the same seed return the same user"
+                            },
+                            "batch": {
+                                "type": "string",
+                                "description": "optional batch id; concurrent calls with the same batch share one user"
                             }
                         },
                         "required": ["gender"]
@@ -179,53 +933,119 @@ class MCP_Server:
 
         @self.app.call_tool()
         async def call_tool(name: str, arguments: Any) -> Sequence[TextContent | ImageContent | EmbeddedResource]:
-            if name == "get_current_weather":
-                if not isinstance(arguments, dict) or "location_name" not in arguments:
-                    logger.error(f"Invalid weather arguments: {arguments} is not a 'dict'")
-                    raise ValueError(f"Invalid weather arguments: {arguments} is not a 'dict'")
+            tool = name if name in TOOL_NAMES else "unknown"
+            metrics.inc(metrics.tool_calls, tool)
+            started = time.perf_counter()
+            try:
+                flight_key = self._flight_key(name, arguments)
+                if flight_key is None:
+                    return await self.dispatch_tool(name, arguments)
+                return await self.single_flight.do(flight_key, lambda: self.dispatch_tool(name, arguments))
+            except Exception:
+                metrics.inc(metrics.tool_errors, tool)
+                raise
+            finally:
+                metrics.tool_latency.observe(tool, time.perf_counter() - started)
 
-                try:
-                    location_name = arguments["location_name"]
-                    logger.info(f"Received weather request for location: {location_name}")
-                    weather = await Weather(locale='zh-cn', unit='metric').get_forecast(location_name)
-                    logger.info(f"Successfully received weather data for location")
-
-                    return [
-                        TextContent(
-                            type="text",
-                            text=json.dumps(weather, indent=3)
-                        )
-                    ]
+    async def dispatch_tool(self, name: str, arguments: Any) -> Sequence[TextContent | ImageContent | EmbeddedResource]:
+        """Run a tool call without coalescing."""
+        if name == "get_current_weather":
+            if not isinstance(arguments, dict) or "location_name" not in arguments:
+                logger.error("Invalid weather arguments: %s is not a 'dict'", arguments)
+                raise ValueError(f"Invalid weather arguments: {arguments} is not a 'dict'")
 
-                except Exception as e:
-                    logger.error(f"Face Error processing weather request: {str(e)}")
-                    raise RuntimeError(f"Weather API error: {str(e)}")
-                    
-            elif name == "create_random_user":
-                try:
-                    gender = arguments.get("gender")
-                    
-                    logger.info(f"Received user generation request with gender={gender}")
-                    user_generator = UserGenerator()
-                    user_data = await user_generator.generate_user(gender)
-                    
-                    return [
-                        TextContent(
-                            type="text",
-                            text=json.dumps(user_data, indent=3)
-                        )
-                    ]
-                except Exception as e:
-                    logger.error(f"Error processing user generation request: {str(e)}")
-                    raise RuntimeError(f"User generation error: {str(e)}")
-            else:
-                logger.error(f"Unknown tool: {name}")
-                raise ValueError(f"Unknown tool: {name}")
+            try:
+                location_name = arguments["location_name"]
+                logger.info("Received weather request for location: %s", location_name)
+                weather = await self.weather.get_forecast(
+                    location_name,
+                    detail=arguments.get("detail", "full"),
+                    fields=arguments.get("fields")
+                )
+                logger.info("Successfully received weather data for location")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Weather cache stats: %s", self.weather_cache.stats())
 
+                return [
+                    TextContent(
+                        type="text",
+                        text=dumps_compact(weather)
+                    )
+                ]
 
-def create_app():
+            except Exception as e:
+                logger.error("Error processing weather request: %s", e)
+                raise RuntimeError(f"Weather API error: {str(e)}")
+                
+        elif name == "get_current_weather_many":
+            locations = arguments.get("locations") if isinstance(arguments, dict) else None
+            if not isinstance(locations, list) or not locations or len(locations) > MAX_BATCH_LOCATIONS:
+                logger.error("Invalid weather batch arguments: %s", arguments)
+                raise ValueError(f"Invalid weather batch arguments: 'locations' must be a list of 1-{MAX_BATCH_LOCATIONS} strings")
+
+            logger.info("Received weather batch request for %d locations", len(locations))
+            forecasts = await self.get_forecasts(
+                locations,
+                max_concurrency=arguments.get("max_concurrency", 8),
+                item_timeout=arguments.get("timeout", 15.0),
+                detail=arguments.get("detail", "full"),
+                fields=arguments.get("fields"),
+                on_result=self._send_partial_result if arguments.get("stream") else None
+            )
+            return [
+                TextContent(
+                    type="text",
+                    text=dumps_compact(forecasts)
+                )
+            ]
+
+        elif name == "create_random_user":
+            try:
+                gender = arguments.get("gender")
+                nationality = arguments.get("nationality")
+                if isinstance(nationality, str):
+                    nationality = nationality.lower()
+                count = arguments.get("count", 1)
+                seed = arguments.get("seed")
+                if not isinstance(count, int) or not 1 <= count <= MAX_USERS_PER_CALL:
+                    raise ValueError(f"'count' must be an integer between 1 and {MAX_USERS_PER_CALL}")
+
+                logger.info("Received user generation request with gender=%s count=%d", gender, count)
+                if seed:
+                    # Seeded users must be reproducible, so they never come from the pool
+                    user_data = await self.user_generator.generate_user(gender, nationality, seed=seed, results=count)
+                else:
+                    users = await self.user_pool.take(count, gender, nationality)
+                    user_data = {"results": users, "info": {"results": len(users)}}
+                
+                return [
+                    TextContent(
+                        type="text",
+                        text=dumps_compact(user_data)
+                    )
+                ]
+            except Exception as e:
+                logger.error("Error processing user generation request: %s", e)
+                raise RuntimeError(f"User generation error: {str(e)}")
+        else:
+            logger.error("Unknown tool: %s", name)
+            raise ValueError(f"Unknown tool: {name}")
+
+
+def create_app(worker_id: Optional[int] = None, internal_port_base: Optional[int] = None,
+               workers: int = 1):
+    """
+    Build the Starlette app.
+
+    Args:
+        worker_id: index of this worker in multi-worker mode, None for a single process
+        internal_port_base: first loopback port used for worker-to-worker forwarding
+        workers: number of workers in multi-worker mode
+    """
     myserver = MCP_Server()
-    sse = SseServerTransport("/request")
+    # In multi-worker mode the worker index is part of the message endpoint, so any
+    # worker can tell which one owns the SSE stream for a session
+    sse = SseServerTransport("/request" if worker_id is None else f"/request/w{worker_id}")
 
     class HandleSSE:
         def __init__(self, sse, myserver):
@@ -233,28 +1053,217 @@ def create_app():
             self.myserver = myserver
 
         async def __call__(self, scope, receive, send):
-            async with self.sse.connect_sse(scope, receive, send) as streams:
-                await self.myserver.app.run(
-                    streams[0],
-                    streams[1],
-                    self.myserver.app.create_initialization_options()
-                )
+            metrics.active_sessions += 1
+            try:
+                async with self.sse.connect_sse(scope, receive, send) as streams:
+                    await self.myserver.app.run(
+                        streams[0],
+                        streams[1],
+                        self.myserver.app.create_initialization_options()
+                    )
+            finally:
+                metrics.active_sessions -= 1
 
     class HandleMessages:
-        def __init__(self, sse):
+        def __init__(self, sse, worker_id=None, internal_port_base=None, client=None, workers=1):
             self.sse = sse
+            self.worker_id = worker_id
+            self.internal_port_base = internal_port_base
+            self.client = client
+            self.workers = workers
 
         async def __call__(self, scope, receive, send):
-            await self.sse.handle_post_message(scope, receive, send)
+            owner = scope.get("path_params", {}).get("worker_id")
+            if owner is None or owner == self.worker_id:
+                await self.sse.handle_post_message(scope, receive, send)
+                return
+            if not 0 <= owner < self.workers:
+                # No such worker, so no such session
+                await Response("Could not find session", status_code=404)(scope, receive, send)
+                return
+            await self.forward(owner, scope, receive, send)
+
+        async def forward(self, owner, scope, receive, send):
+            """Relay a message to the worker that owns the session's SSE stream."""
+            request = Request(scope, receive)
+            try:
+                upstream = await self.client.post(
+                    f"http://127.0.0.1:{self.internal_port_base + owner}{request.url.path}",
+                    params=request.query_params,
+                    content=await request.body(),
+                    headers={"content-type": request.headers.get("content-type", "application/json")}
+                )
+            except httpx.ConnectError:
+                # The owning worker is gone, and its sessions with it
+                logger.warning("Could not forward message to worker %d", owner)
+                await Response("Could not find session", status_code=404)(scope, receive, send)
+                return
+            response = Response(
+                upstream.content,
+                status_code=upstream.status_code,
+                media_type=upstream.headers.get("content-type")
+            )
+            await response(scope, receive, send)
+
+    class HandleStreamableHTTP:
+        """
+        Streamable-HTTP endpoint: each POST carries the request and returns the
+        response in the same HTTP exchange. A JSON array body is treated as a
+        JSON-RPC batch and its messages are dispatched concurrently.
+        """
+
+        def __init__(self, session_manager):
+            self.session_manager = session_manager
+
+        async def __call__(self, scope, receive, send):
+            if scope["method"] != "POST":
+                await self.session_manager.handle_request(scope, receive, send)
+                return
+
+            request = Request(scope, receive)
+            body = await request.body()
+            if not body.lstrip().startswith(b"["):
+                await self.session_manager.handle_request(scope, self._replay(body), send)
+                return
+
+            try:
+                messages = json.loads(body)
+            except json.JSONDecodeError:
+                await PlainTextResponse("Invalid JSON-RPC batch", status_code=400)(scope, receive, send)
+                return
+            if not messages:
+                await PlainTextResponse("Empty JSON-RPC batch", status_code=400)(scope, receive, send)
+                return
+
+            replies = await asyncio.gather(*(self._dispatch(scope, message) for message in messages))
+            # Notifications produce no reply; the batch response only lists real responses
+            results = [reply for reply in replies if reply is not None]
+            if not results:
+                await Response(status_code=202)(scope, receive, send)
+                return
+            await Response(dumps_compact(results), media_type="application/json")(scope, receive, send)
+
+        @staticmethod
+        def _replay(body: bytes):
+            """Return an ASGI receive callable that yields an already-read body."""
+            sent = False
+            disconnected = asyncio.Event()
+
+            async def receive():
+                nonlocal sent
+                if not sent:
+                    sent = True
+                    return {"type": "http.request", "body": body, "more_body": False}
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            return receive
+
+        async def _dispatch(self, scope, message) -> Optional[Any]:
+            """Run one batch entry through the session manager and capture its JSON reply."""
+            body = json.dumps(message).encode("utf-8")
+            headers = [(key, value) for key, value in scope["headers"] if key != b"content-length"]
+            headers.append((b"content-length", str(len(body)).encode("ascii")))
+            chunks = []
+
+            async def send(event):
+                if event["type"] == "http.response.body":
+                    chunks.append(event.get("body", b""))
+
+            await self.session_manager.handle_request({**scope, "headers": headers}, self._replay(body), send)
+            payload = b"".join(chunks)
+            return json.loads(payload) if payload else None
+
+    # Stateless JSON mode: no server-side session, so any worker can answer any request
+    session_manager = StreamableHTTPSessionManager(app=myserver.app, json_response=True, stateless=True)
+
+    async def handle_metrics(request):
+        body = metrics.render({"weather": myserver.weather_cache}, myserver.single_flight)
+        return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
 
     routes = [
         Route("/sse", endpoint=HandleSSE(sse, myserver), methods=["GET"]),
-        Route("/request", endpoint=HandleMessages(sse), methods=["POST"])
+        Route("/request", endpoint=HandleMessages(sse), methods=["POST"]),
+        Route("/mcp", endpoint=HandleStreamableHTTP(session_manager), methods=["GET", "POST", "DELETE"]),
+        Route("/metrics", endpoint=handle_metrics, methods=["GET"])
     ]
+    if worker_id is not None:
+        routes.append(Route(
+            "/request/w{worker_id:int}",
+            endpoint=HandleMessages(sse, worker_id, internal_port_base, myserver.http_client, workers),
+            methods=["POST"]
+        ))
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        async with session_manager.run():
+            yield
+        await myserver.aclose()
+
+    return Starlette(routes=routes, lifespan=lifespan)
+
+
+def _uvicorn_config(app, **kwargs) -> uvicorn.Config:
+    """Use uvloop and httptools when they are installed."""
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "auto"
+    http = "httptools" if importlib.util.find_spec("httptools") else "auto"
+    return uvicorn.Config(app, loop=loop, http=http, **kwargs)
+
 
-    return Starlette(routes=routes)
+def _run_worker(worker_id: int, workers: int, public_socket: socket.socket, internal_port_base: int) -> None:
+    """Serve the shared public socket plus this worker's loopback forwarding port."""
+    internal_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    internal_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    internal_socket.bind(("127.0.0.1", internal_port_base + worker_id))
+    app = create_app(worker_id=worker_id, internal_port_base=internal_port_base, workers=workers)
+    server = uvicorn.Server(_uvicorn_config(app))
+    server.run(sockets=[public_socket, internal_socket])
+
+
+def run_workers(workers: int, host: str, port: int, internal_port_base: int) -> None:
+    """
+    Run several worker processes behind one listening socket.
+
+    SSE session state lives in each worker's memory, so a message POSTed to the
+    wrong worker is forwarded over loopback to the worker that owns the stream.
+    """
+    public_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    public_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    public_socket.bind((host, port))
+    public_socket.set_inheritable(True)
+    logger.info("Starting %d workers on %s:%d", workers, host, port)
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_run_worker, args=(worker_id, workers, public_socket, internal_port_base))
+        for worker_id in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+            process.join()
 
 
 if __name__ == "__main__":
-    app = create_app()
-    uvicorn.run(app, host="127.0.0.1", port=4000)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the MCP SSE server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4000)
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument(
+        "--internal-port-base",
+        type=int,
+        default=14000,
+        help="first loopback port used to forward messages between workers"
+    )
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        run_workers(args.workers, args.host, args.port, args.internal_port_base)
+    else:
+        app = create_app()
+        uvicorn.run(app, host=args.host, port=args.port)
\ No newline at end of file
@@ -1,49 +1,121 @@
-import msal
-import requests
+import argparse
+import csv
+import sys
+import threading
+
+import graph_auth
+import graph_batch
+from checkpoint import Journal
+from throttled_client import ThrottledClient
+from user_input import FORMATS, read_user_rows
+
+# shared by every request so rate limits and retries apply across all workers
+client = ThrottledClient()
+
+# serializes output from concurrent workers; print writes the text and the newline separately
+output_lock = threading.Lock()
+
+def write_line(text):
+    with output_lock:
+        sys.stdout.write(text + "\n")
 
 def get_access_token(client_id, client_secret, tenant_id):
-    authority = f"https://login.microsoftonline.com/{tenant_id}"
-    app = msal.ConfidentialClientApplication(client_id, authority=authority, client_credential=client_secret)
-    scope = ["https://graph.microsoft.com/.default"]
-    result = app.acquire_token_for_client(scopes=scope)
-    return result['access_token']
+    return graph_auth.TokenProvider(client_id, client_secret, tenant_id).get_token()
 
 # add_user function to create a new user in Azure AD
-# headers: The headers containing the access token for the request.
+# headers: The headers for the request; may contain the access token when auth is not given.
 # user_data: the user data which is used to describe the new user.
+# auth: optional graph_auth token provider which sets a fresh access token on the request.
 # based on https://learn.microsoft.com/en-us/graph/api/user-post-users?view=graph-rest-1.0&tabs=http User.ReadWrite.All, Directory.ReadWrite.All is required to get the token
-def add_user(headers, user_data):
-    response = requests.post('https://graph.microsoft.com/v1.0/users', headers=headers, json=user_data)
+def add_user(headers, user_data, graph_url=graph_batch.GRAPH_URL, auth=None):
+    response = client.post(f'{graph_url}/users', headers=headers, json=user_data, auth=auth)
 
     if response.status_code == 201:
-        print("User created successfully.")
+        write_line("User created successfully.")
     else:
-        print(f"Error: {response.status_code}")
-        print(response.json())
+        write_line(f"Error: {response.status_code}\n{response.json()}")
+    return response
 
-# access_token: The access token for the request.
-# user_list: The list of users to add.
-# password_list: The list of passwords for the user.
-def add_users(access_token, user_list, password_list):
+# access_token: The access token or graph_auth.TokenProvider for the requests.
+# rows: (user, password) pairs, e.g. from user_input.read_user_rows; consumed lazily so it may be a generator.
+# journal: optional checkpoint.Journal; each user's outcome is recorded in it as soon as it is known.
+def add_users(access_token, rows, graph_url=graph_batch.GRAPH_URL, journal=None):
     headers = {
-        'Authorization': 'Bearer ' + access_token,
         'Content-Type': 'application/json'
     }
+    auth = graph_auth.as_auth(access_token)
 
-    for user, password in zip(user_list, password_list):
-        # user's format is like aaa@bbb.onmicrosoft.com
-        username = user.split('@')[0]
-        user_data = {
-            "accountEnabled": True,
-            "displayName": username,
-            "mailNickname": username,
-            "userPrincipalName": user,
-            "passwordProfile": {
-                "forceChangePasswordNextSignIn": False,
-                "password": password
-            }
+    def add(row):
+        response = add_user(headers, build_user_data(*row), graph_url, auth)
+        if journal is not None:
+            result, detail = classify_user_response({'status': response.status_code, 'body': response.json()})
+            journal.record(row[0], result != 'failed', detail)
+
+    # users are created concurrently on the client's bounded pool while the rows are still being read
+    for _ in client.map(add, rows):
+        pass
+
+# build the request body used to create one user
+# user's format is like aaa@bbb.onmicrosoft.com
+def build_user_data(user, password):
+    username = user.split('@')[0]
+    return {
+        "accountEnabled": True,
+        "displayName": username,
+        "mailNickname": username,
+        "userPrincipalName": user,
+        "passwordProfile": {
+            "forceChangePasswordNextSignIn": False,
+            "password": password
         }
-        add_user(headers, user_data)
+    }
+
+# map one $batch sub-response to created / exists / failed
+def classify_user_response(response):
+    status = response['status']
+    if status == 201:
+        return 'created', ''
+    message = response.get('body', {}).get('error', {}).get('message', '')
+    if status == 400 and 'already exists' in message:
+        return 'exists', message
+    return 'failed', message
+
+# bulk version of add_users based on https://learn.microsoft.com/en-us/graph/json-batching
+# user creations are packed into $batch requests of batch_size and concurrency batches are sent at once through the shared client
+# rows are (user, password) pairs read lazily, so only the batches in flight are held in memory
+# every input row is written to results_path as created, exists or failed, and to journal when one is given
+def add_users_bulk(access_token, rows, results_path='add_users_results.csv',
+                   batch_size=20, concurrency=4, graph_url=graph_batch.GRAPH_URL, journal=None):
+    auth = graph_auth.as_auth(access_token)
+    # sub-request id -> user for the rows handed to run_batches but not answered yet
+    in_flight = {}
+
+    def batch_requests():
+        for index, (user, password) in enumerate(rows):
+            in_flight[str(index)] = user
+            yield {
+                "id": str(index),
+                "method": "POST",
+                "url": "/users",
+                "headers": {"Content-Type": "application/json"},
+                "body": build_user_data(user, password)
+            }
+
+    counts = {'created': 0, 'exists': 0, 'failed': 0}
+    with open(results_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['userPrincipalName', 'result', 'status', 'detail'])
+        for response in graph_batch.run_batches(client, auth, batch_requests(), batch_size, concurrency, graph_url):
+            result, detail = classify_user_response(response)
+            counts[result] += 1
+            user = in_flight.pop(response['id'])
+            writer.writerow([user, result, response['status'], detail])
+            if journal is not None:
+                journal.record(user, result != 'failed', detail)
+
+    print(f"Created: {counts['created']}, already existing: {counts['exists']}, failed: {counts['failed']}. "
+          f"Results written to {results_path}.")
+    return counts
 
 # function to create a group in Azure AD
 # access_token: The access token for the request.
@@ -51,7 +123,6 @@ def add_users(access_token, user_list, password_list):
 # based on https://learn.microsoft.com/en-us/graph/api/group-post-groups?view=graph-rest-1.0&tabs=http , Group.ReadWrite.All is required to get the token
 def add_group(access_token, group_name):
     headers = {
-        'Authorization': 'Bearer ' + access_token,
         'Content-Type': 'application/json'
     }
 
@@ -62,7 +133,8 @@ def add_group(access_token, group_name):
         "securityEnabled": True
     }
 
-    response = requests.post('https://graph.microsoft.com/v1.0/groups', headers=headers, json=group_data)
+    response = client.post('https://graph.microsoft.com/v1.0/groups', headers=headers, json=group_data,
+                           auth=graph_auth.as_auth(access_token))
 
     if response.status_code == 201:
         print("Group created successfully.")
@@ -70,34 +142,44 @@ def add_group(access_token, group_name):
         print(f"Error: {response.status_code}")
         print(response.json())
 
-# read user list from file
-# each line is a user and password pair separated by tab key
-def read_user_list():
-    with open('users.txt', 'r') as f:
-        lines = f.read().splitlines()
-    
-    # userlist is the first part of each line before tab key
-    userlist = [line.split('\t')[0] for line in lines]
-    return userlist
-
-# read password list from file
-# each line is a user and password pair separated by tab key
-def read_password_list():
-    with open('users.txt', 'r') as f:
-        lines = f.read().splitlines()
-    
-    # passwordlist is the second part of each line after tab key
-    passwordlist = [line.split('\t')[1] for line in lines]
-    return passwordlist
-
 # Example usage
 CLIENT_ID = '<client_id>'
 CLIENT_SECRET = '<client_secret>'
 TENANT_ID = '<tenant_id>'
 
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create Azure AD users listed in users.txt.")
+    parser.add_argument("--input", default="users.txt",
+                        help="user and password list: tab separated like users.txt, CSV with a header, or JSONL")
+    parser.add_argument("--format", choices=FORMATS, help="input format; detected from the file extension by default")
+    parser.add_argument("--bulk", action="store_true", help="create users with concurrent Graph $batch requests")
+    parser.add_argument("--batch-size", type=int, default=20, help="users per $batch request (max 20)")
+    parser.add_argument("--concurrency", type=int, default=4, help="$batch requests sent at the same time")
+    parser.add_argument("--results", default="add_users_results.csv", help="results file written in bulk mode")
+    parser.add_argument("--graph-url", default=graph_batch.GRAPH_URL,
+                        help="Graph base URL, e.g. http://127.0.0.1:8080/v1.0 for graph_stub_server.py")
+    parser.add_argument("--access-token", help="use this token instead of requesting one with CLIENT_ID/CLIENT_SECRET")
+    parser.add_argument("--token-cache", help="persist the MSAL token cache to this file between runs")
+    parser.add_argument("--journal", default="add_users.journal.jsonl", help="checkpoint file recording each user's outcome")
+    parser.add_argument("--resume", action="store_true", help="skip users the journal already records as done")
+    parser.add_argument("--dry-run", action="store_true", help="compare users.txt with the journal and exit without calling Graph")
+    args = parser.parse_args()
 
-users = read_user_list()
-passwords = read_password_list()
-access_token = get_access_token(CLIENT_ID, CLIENT_SECRET, TENANT_ID)
-add_users(access_token, users, passwords)
\ No newline at end of file
+    # the file is read once, row by row, while earlier rows are already being submitted
+    rows = read_user_rows(args.input, fmt=args.format)
+    journal = Journal(args.journal)
+    if args.dry_run:
+        journal.print_diff(row.user for row in rows)
+        raise SystemExit(0)
+    if args.resume:
+        print(f"Resuming from {args.journal}: users already recorded as done are skipped.")
+        rows = (row for row in rows if not journal.is_done(row.user))
+    # the provider refreshes the token before it expires, so long bulk runs keep working
+    access_token = args.access_token or graph_auth.TokenProvider(CLIENT_ID, CLIENT_SECRET, TENANT_ID,
+                                                                 cache_path=args.token_cache)
+    with journal:
+        if args.bulk:
+            add_users_bulk(access_token, rows, args.results, args.batch_size, args.concurrency, args.graph_url, journal)
+        else:
+            add_users(access_token, rows, args.graph_url, journal)
\ No newline at end of file
@@ -1,23 +1,28 @@
-import requests
+import argparse
 import json
-import msal
+import os
+from urllib.parse import quote
+
+import graph_auth
+import graph_batch
+from checkpoint import Journal
+from throttled_client import ThrottledClient
+from user_input import FORMATS, read_user_rows
+
+# shared by every request so rate limits and retries apply across all workers
+client = ThrottledClient()
 
 
 def get_access_token(client_id, client_secret, tenant_id):
-    authority = f"https://login.microsoftonline.com/{tenant_id}"
-    app = msal.ConfidentialClientApplication(client_id, authority=authority, client_credential=client_secret)
-    scope = ["https://graph.microsoft.com/.default"]
-    result = app.acquire_token_for_client(scopes=scope)
-    return result['access_token']
+    return graph_auth.TokenProvider(client_id, client_secret, tenant_id).get_token()
 
 def get_app_role_assignments(access_token, user_id):
     url = f'https://graph.microsoft.com/v1.0/users/{user_id}/appRoleAssignments'
     headers = {
-        'Authorization': f'Bearer {access_token}',
         'Content-Type': 'application/json'
     }
 
-    response = requests.get(url, headers=headers)
+    response = client.get(url, headers=headers, auth=graph_auth.as_auth(access_token))
 
     if response.status_code == 200:
         app_role_assignments = response.json()
@@ -30,7 +35,6 @@ def get_app_role_assignments(access_token, user_id):
 def post_app_role_assignments(access_token, user_id, app_role_id, resource_id):
     url = f'https://graph.microsoft.com/v1.0/users/{user_id}/appRoleAssignments'
     headers = {
-    'Authorization': f'Bearer {access_token}',
     'Content-Type': 'application/json'
     }
     body = {
@@ -39,23 +43,112 @@ def post_app_role_assignments(access_token, user_id, app_role_id, resource_id):
         "appRoleId": app_role_id
     }
 
-    response = requests.post(url, headers=headers, json=body)
+    response = client.post(url, headers=headers, json=body, auth=graph_auth.as_auth(access_token))
     if response.status_code == 201:
         print('App role assignment created successfully.')
     else:
         print(f'Error: {response.status_code}\n{response.text}')
+    return response
 
 def get_user_principalId(access_token, user_id):
     url = f'https://graph.microsoft.com/v1.0/users/{user_id}'
     headers = {
-        'Authorization': f'Bearer {access_token}',
         'Content-Type': 'application/json'
     }
 
-    response = requests.get(url, headers=headers)
+    response = client.get(url, headers=headers, auth=graph_auth.as_auth(access_token))
     return response.json()['id']
 
 
+# resolve user principal names to object ids in bulk with $batch lookups
+# resolved ids are kept in cache_path (a upn -> id JSON file) so re-runs cost no lookups
+def resolve_user_ids(access_token, upns, cache_path='upn_ids.json', concurrency=4, graph_url=graph_batch.GRAPH_URL):
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+
+    missing = [upn for upn in dict.fromkeys(upns) if upn not in cache]
+    if missing:
+        auth = graph_auth.as_auth(access_token)
+        batch_requests = [
+            {"id": str(index), "method": "GET", "url": f"/users/{quote(upn)}?$select=id"}
+            for index, upn in enumerate(missing)
+        ]
+        for response in graph_batch.run_batches(client, auth, batch_requests, concurrency=concurrency,
+                                                graph_url=graph_url):
+            upn = missing[int(response['id'])]
+            if response['status'] == 200:
+                cache[upn] = response['body']['id']
+            else:
+                print(f"Could not resolve {upn}: {response['status']} {response.get('body')}")
+
+        # write to a temp file first so an interrupted run never leaves a corrupt cache
+        with open(cache_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(cache_path + '.tmp', cache_path)
+
+    return cache
+
+# get the principal ids which already have app_role_id on the resource service principal
+# based on https://learn.microsoft.com/en-us/graph/api/serviceprincipal-list-approleassignedto?view=graph-rest-1.0&tabs=http
+def get_assigned_principal_ids(access_token, resource_id, app_role_id, graph_url=graph_batch.GRAPH_URL):
+    url = f'{graph_url}/servicePrincipals/{resource_id}/appRoleAssignedTo?$select=principalId,appRoleId&$top=999'
+    auth = graph_auth.as_auth(access_token)
+    assigned = set()
+    while url:
+        response = client.get(url, auth=auth)
+        response.raise_for_status()
+        data = response.json()
+        assigned.update(item['principalId'] for item in data.get('value', []) if item['appRoleId'] == app_role_id)
+        url = data.get('@odata.nextLink')
+    return assigned
+
+# bulk version of the assignment loop:
+# 1. resolve all users to object ids with batched lookups backed by the on-disk cache
+# 2. read existing assignments once from the service principal and skip users who already have the role
+# 3. submit the remaining assignments as concurrent $batch requests
+# when a checkpoint.Journal is given, every user's outcome is recorded in it
+def assign_app_role_bulk(access_token, upns, app_role_id, resource_id, cache_path='upn_ids.json', concurrency=4,
+                         graph_url=graph_batch.GRAPH_URL, journal=None):
+    user_ids = resolve_user_ids(access_token, upns, cache_path, concurrency, graph_url)
+    assigned = get_assigned_principal_ids(access_token, resource_id, app_role_id, graph_url)
+    pending = []
+    for upn in dict.fromkeys(upns):
+        if upn not in user_ids:
+            if journal is not None:
+                journal.record(upn, False, 'unresolved')
+        elif user_ids[upn] in assigned:
+            if journal is not None:
+                journal.record(upn, True, 'already assigned')
+        else:
+            pending.append((upn, user_ids[upn]))
+    print(f"{len(upns) - len(pending)} users skipped (already assigned or unresolved), {len(pending)} to assign.")
+
+    auth = graph_auth.as_auth(access_token)
+    batch_requests = [
+        {
+            "id": str(index),
+            "method": "POST",
+            "url": f"/users/{user_id}/appRoleAssignments",
+            "headers": {"Content-Type": "application/json"},
+            "body": {"principalId": user_id, "resourceId": resource_id, "appRoleId": app_role_id}
+        }
+        for index, (upn, user_id) in enumerate(pending)
+    ]
+    created = 0
+    for response in graph_batch.run_batches(client, auth, batch_requests, concurrency=concurrency, graph_url=graph_url):
+        upn = pending[int(response['id'])][0]
+        if response['status'] == 201:
+            created += 1
+        else:
+            print(f"Error assigning {upn}: {response['status']} {response.get('body')}")
+        if journal is not None:
+            journal.record(upn, response['status'] == 201, str(response['status']))
+    print(f"App role assignments created: {created}/{len(pending)}.")
+    return created
+
+
 # Example usage:
 client_id = '<client_id>'
 client_secret = '<client_secret>'
@@ -72,21 +165,70 @@ tenant_id = '<tenant_id>'
 resource_id = '<resource_id>'
 app_role_id = '<app_role_id>'
 
-access_token = get_access_token(client_id, client_secret, tenant_id)
-
 # read user list from file
-# each line is a user and password pair separated by tab key
-def read_user_list():
-    with open('users.txt', 'r') as f:
-        lines = f.read().splitlines()
-    
-    # userlist is the first part of each line before tab key
-    userlist = [line.split('\t')[0] for line in lines]
-    return userlist
-
-userlist = read_user_list()
-
-for user in userlist:
+# each line is a user and password pair separated by tab key; the password is not needed here
+def read_user_list(path='users.txt', fmt=None):
+    return (row.user for row in read_user_rows(path, require_password=False, fmt=fmt))
+
+# look up one user and assign the app role to it
+# the outcome is recorded in journal when one is given; a failure is recorded
+# rather than raised so one bad user does not abort the other workers
+def assign_app_role(user, journal=None):
     print(user.strip())
-    user_principalId =  get_user_principalId(access_token, user.strip())
-    post_app_role_assignments(access_token, user_principalId, app_role_id, resource_id)
\ No newline at end of file
+    try:
+        user_principalId =  get_user_principalId(access_token, user.strip())
+    except Exception as e:
+        print(f"Could not resolve {user.strip()}: {e!r}")
+        if journal is not None:
+            journal.record(user.strip(), False, 'unresolved')
+        return
+    try:
+        response = post_app_role_assignments(access_token, user_principalId, app_role_id, resource_id)
+    except Exception as e:
+        print(f"Error assigning {user.strip()}: {e!r}")
+        if journal is not None:
+            journal.record(user.strip(), False, repr(e))
+        return
+    if journal is not None:
+        journal.record(user.strip(), response.status_code == 201, str(response.status_code))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assign the EMU app role to the users listed in users.txt.")
+    parser.add_argument("--input", default="users.txt",
+                        help="user list: tab separated like users.txt, CSV with a header, or JSONL")
+    parser.add_argument("--format", choices=FORMATS, help="input format; detected from the file extension by default")
+    parser.add_argument("--bulk", action="store_true",
+                        help="resolve users and submit assignments with $batch, skipping users who already have the role")
+    parser.add_argument("--id-cache", default="upn_ids.json", help="on-disk UPN -> object id cache used in bulk mode")
+    parser.add_argument("--concurrency", type=int, default=4, help="$batch requests sent at the same time")
+    parser.add_argument("--graph-url", default=graph_batch.GRAPH_URL,
+                        help="Graph base URL used in bulk mode, e.g. http://127.0.0.1:8080/v1.0 for graph_stub_server.py")
+    parser.add_argument("--access-token", help="use this token instead of requesting one with client_id/client_secret")
+    parser.add_argument("--token-cache", help="persist the MSAL token cache to this file between runs")
+    parser.add_argument("--journal", default="assign_app_role.journal.jsonl",
+                        help="checkpoint file recording each user's outcome")
+    parser.add_argument("--resume", action="store_true", help="skip users the journal already records as done")
+    parser.add_argument("--dry-run", action="store_true", help="compare users.txt with the journal and exit without calling Graph")
+    args = parser.parse_args()
+
+    # the provider refreshes the token before it expires, so long runs keep working
+    access_token = args.access_token or graph_auth.TokenProvider(client_id, client_secret, tenant_id,
+                                                                 cache_path=args.token_cache)
+    # users are streamed from the file; only bulk mode needs them all at once to resolve and diff ids
+    userlist = read_user_list(args.input, args.format)
+    journal = Journal(args.journal)
+    if args.dry_run:
+        journal.print_diff(userlist)
+        raise SystemExit(0)
+    if args.resume:
+        print(f"Resuming from {args.journal}: users already recorded as done are skipped.")
+        userlist = (user for user in userlist if not journal.is_done(user))
+
+    with journal:
+        if args.bulk:
+            assign_app_role_bulk(access_token, list(userlist), app_role_id, resource_id, args.id_cache, args.concurrency,
+                                 args.graph_url, journal)
+        else:
+            # users are processed concurrently on the client's bounded pool
+            for _ in client.map(lambda user: assign_app_role(user, journal), userlist):
+                pass
\ No newline at end of file
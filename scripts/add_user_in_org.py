@@ -1,4 +1,12 @@
-import requests
+import argparse
+import json
+
+from checkpoint import Journal
+from membership_sync import apply_delta, diff_members
+from throttled_client import ThrottledClient
+
+# shared by every request so GitHub rate limits and retries apply across all workers
+client = ThrottledClient()
 
 def add_user_to_team(username, token, org, team):
     url = f"https://api.github.com/orgs/{org}/teams/{team}/memberships/{username}"
@@ -11,7 +19,7 @@ def add_user_to_team(username, token, org, team):
         "role": "member"
     }
 
-    response = requests.put(url, headers=headers, json=data)
+    response = client.put(url, headers=headers, json=data)
     print(response.json())  
     return response.status_code, response.json()
 
@@ -26,9 +34,87 @@ def add_user_to_organization(username, token, org):
         "role": "member"
     }
 
-    response = requests.put(url, headers=headers, json=data)
+    response = client.put(url, headers=headers, json=data)
     return response.status_code, response.json()
 
+def remove_user_from_team(username, token, org, team):
+    url = f"https://api.github.com/orgs/{org}/teams/{team}/memberships/{username}"
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"Bearer {token}",
+        "X-GitHub-Api-Version": "2022-11-28"
+    }
+
+    response = client.delete(url, headers=headers)
+    return response.status_code
+
+def remove_user_from_organization(username, token, org):
+    url = f"https://api.github.com/orgs/{org}/memberships/{username}"
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"Bearer {token}",
+        "X-GitHub-Api-Version": "2022-11-28"
+    }
+
+    response = client.delete(url, headers=headers)
+    return response.status_code
+
+# list the logins of a team's members and pending invitees, reading every page once
+# invitees count as current so that re-runs do not add them again
+def get_team_members(token, org, team):
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"Bearer {token}",
+        "X-GitHub-Api-Version": "2022-11-28"
+    }
+    members = [member["login"] for member in
+               client.paginate(f"https://api.github.com/orgs/{org}/teams/{team}/members", params={"per_page": 100}, headers=headers)]
+    invitees = [invitation["login"] for invitation in
+                client.paginate(f"https://api.github.com/orgs/{org}/teams/{team}/invitations", params={"per_page": 100}, headers=headers)
+                if invitation.get("login")]
+    return members + invitees
+
+# list the logins of an organization's members and pending invitees
+# invitees count as current so that re-runs do not invite them again
+def get_organization_members(token, org):
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"Bearer {token}",
+        "X-GitHub-Api-Version": "2022-11-28"
+    }
+    members = [member["login"] for member in
+               client.paginate(f"https://api.github.com/orgs/{org}/members", params={"per_page": 100}, headers=headers)]
+    invitees = [invitation["login"] for invitation in
+                client.paginate(f"https://api.github.com/orgs/{org}/invitations", params={"per_page": 100}, headers=headers)
+                if invitation.get("login")]
+    return members + invitees
+
+# make a team's membership match the desired logins
+# current members are read once and only the difference is written, concurrently, so an up-to-date team costs no writes
+# remove: also remove members who are not desired; dry_run: only print the changes
+def sync_team(token, org, team, desired, remove=False, dry_run=False):
+    to_add, to_remove = diff_members(get_team_members(token, org, team), desired, remove)
+    return apply_delta(client, team, to_add, to_remove,
+                       lambda login: add_user_to_team(login, token, org, team)[0],
+                       lambda login: remove_user_from_team(login, token, org, team),
+                       dry_run)
+
+# sync several teams concurrently; desired_by_team maps team slug -> desired logins
+def sync_teams(token, org, desired_by_team, remove=False, dry_run=False):
+    def sync(item):
+        team, desired = item
+        return team, sync_team(token, org, team, desired, remove, dry_run)
+
+    return dict(client.map(sync, desired_by_team.items()))
+
+# make the organization's membership match the desired logins, like sync_team
+def sync_organization(token, org, desired, remove=False, dry_run=False):
+    to_add, to_remove = diff_members(get_organization_members(token, org), desired, remove)
+    return apply_delta(client, org, to_add, to_remove,
+                       lambda login: add_user_to_organization(login, token, org)[0],
+                       lambda login: remove_user_from_organization(login, token, org),
+                       dry_run)
+
 # function add team to organization
 def add_team_to_organization(token, org, team):
     url = f"https://api.github.com/orgs/{org}/teams"
@@ -44,7 +130,7 @@ def add_team_to_organization(token, org, team):
         "notification_setting": "notifications_disabled",
         "privacy": "closed"
     } 
-    response_json = requests.post(url, headers=headers, json=data)
+    response_json = client.post(url, headers=headers, json=data)
     print(response_json)
 
 
@@ -57,12 +143,53 @@ file_path = "<file-path>"
 
 # a function to read txt line by line
 # each line is a github handle
-# then call add_user_to_organization for each github handle
-def add_users_from_file(filename, token, org):
+# then call add_user_to_organization for each github handle, concurrently on the client's bounded pool
+# journal: optional checkpoint.Journal; each handle's outcome is recorded in it
+# resume: skip the handles the journal already records as done
+def add_users_from_file(filename, token, org, journal=None, resume=False):
+    def add(username):
+        status_code, response = add_user_to_organization(username, token, org)
+        print(f"Added {username} to {org}: {status_code} - {response}")
+        if journal is not None:
+            journal.record(username, status_code == 200, str(status_code))
+
     with open(filename, 'r') as file:
-        for line in file:
-            username = line.strip()
-            status_code, response = add_user_to_organization(username, token, org)
-            print(f"Added {username} to {org}: {status_code} - {response}")
+        usernames = [line.strip() for line in file if line.strip()]
+    if resume and journal is not None:
+        remaining = journal.pending(usernames)
+        print(f"Resuming: {len(usernames) - len(remaining)} users already done, {len(remaining)} remaining.")
+        usernames = remaining
+    for _ in client.map(add, usernames):
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add the GitHub handles listed in a file to an organization.")
+    parser.add_argument("--file", default=file_path, help="file with one GitHub handle per line")
+    parser.add_argument("--journal", default="add_user_in_org.journal.jsonl",
+                        help="checkpoint file recording each handle's outcome")
+    parser.add_argument("--resume", action="store_true", help="skip handles the journal already records as done")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="compare the file with the journal (or, with --sync, with GitHub) and exit without writing")
+    parser.add_argument("--sync", action="store_true",
+                        help="add only the handles in the file that are not members or invited yet")
+    parser.add_argument("--sync-teams", help="JSON file mapping team slug -> desired handles; sync those teams")
+    parser.add_argument("--remove", action="store_true", help="with --sync or --sync-teams, also remove members who are not listed")
+    args = parser.parse_args()
+
+    if args.sync_teams:
+        with open(args.sync_teams, 'r', encoding='utf-8') as f:
+            results = sync_teams(token, org, json.load(f), args.remove, args.dry_run)
+        unchanged = sum(1 for counts in results.values() if not any(counts.values()))
+        print(f"{len(results)} teams synced, {unchanged} already up to date.")
+        raise SystemExit(0)
+    if args.sync:
+        with open(args.file, 'r') as file:
+            sync_organization(token, org, [line.strip() for line in file if line.strip()], args.remove, args.dry_run)
+        raise SystemExit(0)
 
-add_users_from_file(file_path, token, org)
+    with Journal(args.journal) as journal:
+        if args.dry_run:
+            with open(args.file, 'r') as file:
+                journal.print_diff([line.strip() for line in file if line.strip()])
+        else:
+            add_users_from_file(args.file, token, org, journal, args.resume)
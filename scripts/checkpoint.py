@@ -0,0 +1,71 @@
+import json
+import os
+import threading
+import time
+
+
+class Journal:
+    """
+    Append-only JSONL record of per-row outcomes for a bulk provisioning run.
+
+    Each line is {"key", "status", "detail", "time"}; the last line for a key wins.
+    Re-running with resume skips keys whose last status is "done", so a restarted
+    job only pays for the rows that are still missing or failed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.status = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # the last line may be cut short if the previous run crashed mid-write
+                        continue
+                    self.status[entry['key']] = entry['status']
+        self.lock = threading.Lock()
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def is_done(self, key):
+        return self.status.get(key) == 'done'
+
+    def pending(self, keys):
+        """Return the keys that have not completed yet, in input order."""
+        return [key for key in keys if not self.is_done(key)]
+
+    def record(self, key, ok, detail=''):
+        """Append the outcome for key; safe to call from several worker threads."""
+        status = 'done' if ok else 'failed'
+        line = json.dumps({"key": key, "status": status, "detail": detail, "time": time.time()})
+        with self.lock:
+            self.status[key] = status
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def diff(self, keys):
+        """Compare the desired keys with the journal: which are done, failed or never attempted."""
+        result = {'done': [], 'failed': [], 'pending': []}
+        for key in keys:
+            status = self.status.get(key)
+            result['done' if status == 'done' else 'failed' if status == 'failed' else 'pending'].append(key)
+        return result
+
+    def print_diff(self, keys):
+        """Print the dry-run summary for keys and return the diff."""
+        result = self.diff(keys)
+        print(f"Journal {self.path}: {len(result['done'])} done, {len(result['failed'])} failed, "
+              f"{len(result['pending'])} never attempted.")
+        for key in result['failed'] + result['pending']:
+            print(f"  would process: {key}")
+        return result
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
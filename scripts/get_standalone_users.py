@@ -1,6 +1,16 @@
 # This code is generated by GitHub Copilot (VS Code)
 
-import requests
+import argparse
+import csv
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from membership_sync import apply_delta, diff_members
+from throttled_client import ThrottledClient
+
+# shared by every request so GitHub rate limits and retries apply across all calls
+client = ThrottledClient()
 
 # This code is generated by GitHub Copilot (VS Code)
 def get_enterprise_users(enterprise_name, token):
@@ -20,9 +30,154 @@ def get_enterprise_users(enterprise_name, token):
         "Authorization": f"Bearer {token}",
         "X-GitHub-Api-Version": "2022-11-28"
     }
-    response = requests.get(url, headers=headers)
+    response = client.get(url, headers=headers)
     return response
 
+def iter_enterprise_users(enterprise_name, token, count=100):
+    """
+    Yields every SCIM user of an enterprise, following startIndex/count pagination.
+
+    The next page is requested in the background while the current one is being
+    consumed, and only those two pages are held in memory at a time.
+
+    Args:
+        enterprise_name (str): The name of the enterprise.
+        token (str): The personal access token for authentication.
+        count (int): Users requested per page.
+
+    Yields:
+        dict: One SCIM user resource.
+    """
+    url = f"https://api.github.com/scim/v2/enterprises/{enterprise_name}/Users"
+    headers = {
+        "Accept": "application/scim+json",
+        "Authorization": f"Bearer {token}",
+        "X-GitHub-Api-Version": "2022-11-28"
+    }
+
+    def fetch(start_index):
+        response = client.get(url, headers=headers, params={"startIndex": start_index, "count": count})
+        response.raise_for_status()
+        return response.json()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        start_index = 1
+        page = executor.submit(fetch, start_index)
+        while page is not None:
+            data = page.result()
+            resources = data.get("Resources", [])
+            start_index += len(resources)
+            more = resources and start_index <= data.get("totalResults", 0)
+            # ask for the next page before handing this one out
+            page = executor.submit(fetch, start_index) if more else None
+            yield from resources
+
+def iter_link_pages(url, token, params=None):
+    """
+    Yields the items of a paginated GitHub REST list, following the Link header.
+
+    Args:
+        url (str): The first page URL.
+        token (str): The personal access token for authentication.
+        params (dict): Query parameters for the first page.
+
+    Yields:
+        dict: One item of the list.
+    """
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"Bearer {token}",
+        "X-GitHub-Api-Version": "2022-11-28"
+    }
+    yield from client.paginate(url, params={"per_page": 100, **(params or {})}, headers=headers)
+
+def get_enterprise_team_members(enterprise, token, teams=None):
+    """
+    Collects the logins of the members of enterprise teams.
+
+    Args:
+        enterprise (str): The name of the enterprise.
+        token (str): The personal access token for authentication.
+        teams (list): Team slugs to read; every team of the enterprise when None.
+
+    Returns:
+        set: Lowercase logins of all members of the teams.
+    """
+    base = f"https://api.github.com/enterprises/{enterprise}/teams"
+    if teams is None:
+        teams = [team["slug"] for team in iter_link_pages(base, token)]
+    members = set()
+    for team in teams:
+        members.update(member["login"].lower() for member in iter_link_pages(f"{base}/{team}/memberships", token))
+    return members
+
+def scim_login(user, shortcode=None):
+    """
+    Returns the GitHub login of a SCIM user.
+
+    For Enterprise Managed Users the login is the normalized IdP user name
+    followed by _shortcode: the domain of an email address is dropped and
+    characters GitHub does not allow become "-".
+
+    Args:
+        user (dict): SCIM user resource.
+        shortcode (str): The enterprise shortcode, for managed user enterprises.
+
+    Returns:
+        str: The lowercase login.
+    """
+    name = user.get("userName", "")
+    if shortcode:
+        name = re.sub(r"[^A-Za-z0-9-]", "-", name.split("@")[0]) + f"_{shortcode}"
+    return name.lower()
+
+def iter_standalone_users(users, member_logins, shortcode=None):
+    """
+    Yields the SCIM users who are not a member of any of the given teams.
+
+    member_logins is a set, so each user costs one hash lookup and the whole
+    join is a single pass over users.
+
+    Args:
+        users (iterable): SCIM user resources, e.g. from iter_enterprise_users.
+        member_logins (set): Lowercase logins of team members.
+        shortcode (str): The enterprise shortcode, for managed user enterprises.
+
+    Yields:
+        dict: One SCIM user resource.
+    """
+    for user in users:
+        if scim_login(user, shortcode) not in member_logins:
+            yield user
+
+def export_users(users, path, fmt="jsonl"):
+    """
+    Writes SCIM users to a JSONL or CSV file as they arrive.
+
+    Args:
+        users (iterable): SCIM user resources.
+        path (str): The output file.
+        fmt (str): "jsonl" for one resource per line, or "csv" for the main attributes.
+
+    Returns:
+        int: The number of users written.
+    """
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(["id", "userName", "displayName", "email", "active"])
+        for user in users:
+            if fmt == "csv":
+                emails = user.get("emails") or [{}]
+                primary = next((email for email in emails if email.get("primary")), emails[0])
+                writer.writerow([user.get("id"), user.get("userName"), user.get("displayName"),
+                                 primary.get("value", ""), user.get("active")])
+            else:
+                f.write(json.dumps(user) + "\n")
+            written += 1
+    return written
+
 def add_enterprise_team_member(enterprise, team, username, token):
     """
     Adds a user to an enterprise team.
@@ -42,5 +197,105 @@ def add_enterprise_team_member(enterprise, team, username, token):
         "Authorization": f"Bearer {token}",
         "X-GitHub-Api-Version": "2022-11-28"
     }
-    response = requests.put(url, headers=headers)
-    return response
\ No newline at end of file
+    response = client.put(url, headers=headers)
+    return response
+
+def remove_enterprise_team_member(enterprise, team, username, token):
+    """
+    Removes a user from an enterprise team.
+
+    Args:
+        enterprise (str): The name of the enterprise.
+        team (str): The name of the team.
+        username (str): The username of the user to remove.
+        token (str): The personal access token for authentication.
+
+    Returns:
+        requests.Response: The response object from the API call.
+    """
+    url = f"https://api.github.com/enterprises/{enterprise}/teams/{team}/memberships/{username}"
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"Bearer {token}",
+        "X-GitHub-Api-Version": "2022-11-28"
+    }
+    response = client.delete(url, headers=headers)
+    return response
+
+def sync_enterprise_team(enterprise, team, desired, token, remove=False, dry_run=False):
+    """
+    Makes an enterprise team's membership match a desired list of logins.
+
+    Current members are read once, the difference is computed with set
+    operations, and only the missing additions (and removals when remove is
+    set) are sent, concurrently, so an up-to-date team costs no writes.
+
+    Args:
+        enterprise (str): The name of the enterprise.
+        team (str): The name of the team.
+        desired (iterable): Logins that should be members.
+        token (str): The personal access token for authentication.
+        remove (bool): Also remove members who are not in desired.
+        dry_run (bool): Only print the changes.
+
+    Returns:
+        dict: Counts of added, removed and failed logins.
+    """
+    current = [member["login"] for member in
+               iter_link_pages(f"https://api.github.com/enterprises/{enterprise}/teams/{team}/memberships", token)]
+    to_add, to_remove = diff_members(current, desired, remove)
+    return apply_delta(
+        client, team, to_add, to_remove,
+        lambda login: add_enterprise_team_member(enterprise, team, login, token).status_code,
+        lambda login: remove_enterprise_team_member(enterprise, team, login, token).status_code,
+        dry_run,
+    )
+
+def sync_enterprise_teams(enterprise, desired_by_team, token, remove=False, dry_run=False):
+    """
+    Syncs several enterprise teams concurrently; see sync_enterprise_team.
+
+    Args:
+        enterprise (str): The name of the enterprise.
+        desired_by_team (dict): Team name -> logins that should be members.
+        token (str): The personal access token for authentication.
+        remove (bool): Also remove members who are not listed.
+        dry_run (bool): Only print the changes.
+
+    Returns:
+        dict: Team name -> counts of added, removed and failed logins.
+    """
+    def sync(item):
+        team, desired = item
+        return team, sync_enterprise_team(enterprise, team, desired, token, remove, dry_run)
+
+    return dict(client.map(sync, desired_by_team.items()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the SCIM users of an enterprise, optionally only those in no team.")
+    parser.add_argument("enterprise", help="enterprise slug")
+    parser.add_argument("--token", required=True, help="personal access token with the scim:enterprise scope")
+    parser.add_argument("--output", default="enterprise_users.jsonl", help="file the users are written to")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--standalone", action="store_true", help="only export users who are not in any enterprise team")
+    parser.add_argument("--team", action="append", help="team slug to join against (repeatable); all teams by default")
+    parser.add_argument("--shortcode", help="enterprise shortcode, for managed user enterprises")
+    parser.add_argument("--sync-teams", help="JSON file mapping team slug -> desired logins; sync the teams instead of exporting")
+    parser.add_argument("--remove", action="store_true", help="with --sync-teams, also remove members who are not listed")
+    parser.add_argument("--dry-run", action="store_true", help="with --sync-teams, only print the changes")
+    args = parser.parse_args()
+
+    if args.sync_teams:
+        with open(args.sync_teams, "r", encoding="utf-8") as f:
+            desired_by_team = json.load(f)
+        results = sync_enterprise_teams(args.enterprise, desired_by_team, args.token, args.remove, args.dry_run)
+        unchanged = sum(1 for counts in results.values() if not any(counts.values()))
+        print(f"{len(results)} teams synced, {unchanged} already up to date.")
+        raise SystemExit(0)
+
+    users = iter_enterprise_users(args.enterprise, args.token)
+    if args.standalone:
+        members = get_enterprise_team_members(args.enterprise, args.token, args.team)
+        users = iter_standalone_users(users, members, args.shortcode)
+    written = export_users(users, args.output, args.format)
+    print(f"Wrote {written} users to {args.output}.")
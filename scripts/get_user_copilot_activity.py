@@ -1,30 +1,244 @@
 # This code is generated by GitHub Copilot (VS Code)
+import argparse
+import asyncio
+import json
+import math
+import os
+import numpy as np
+import pandas as pd
+import httpx
 import requests
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
+from throttled_client import ThrottledClient
 
-def get_copilot_activity(org: str, token: str) -> Dict[str, Any]:
+SEATS_PER_PAGE = 100
+
+# upper bounds (in days since last activity) of the inactivity buckets used by the analytics report
+INACTIVITY_BUCKETS = [7, 30, 90]
+
+# shared by every request so GitHub rate limits and retries apply across all pages and orgs
+client = ThrottledClient()
+
+
+class SeatSnapshot:
     """
-    Query GitHub Copilot activity for users in an organization.
-    
+    On-disk state of earlier runs: the ETag and seats of every fetched page, and
+    each seat's last_activity_at, per organization.
+
+    Pages whose ETag still matches are answered with 304 Not Modified, which does
+    not count against the rate limit, and their seats are served from here.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data = {"pages": {}, "activity": {}}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    def page(self, url: str) -> Optional[Dict[str, Any]]:
+        return self.data["pages"].get(url)
+
+    def set_page(self, url: str, etag: str, body: Dict[str, Any]) -> None:
+        self.data["pages"][url] = {"etag": etag, "body": body}
+
+    def changed_seats(self, org: str, seats: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Return the seats that are new or whose last_activity_at differs from the
+        previous run, and remember the current values for the next one.
+        """
+        previous = self.data["activity"].get(org, {})
+        current = {seat.get("assignee", {}).get("login"): seat.get("last_activity_at") for seat in seats}
+        self.data["activity"][org] = current
+        return [seat for seat in seats
+                if seat.get("assignee", {}).get("login") not in previous
+                or previous[seat.get("assignee", {}).get("login")] != seat.get("last_activity_at")]
+
+    def save(self) -> None:
+        # write to a temp file first so an interrupted run never leaves a corrupt snapshot
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.data, f)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def _get_seat_page(url: str, token: str,
+                   snapshot: Optional[SeatSnapshot] = None) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    Fetch one page of seats, conditionally when the snapshot has its ETag.
+
+    Returns:
+        The page body (from the snapshot on 304 Not Modified) and the Link header's next URL
+    """
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"Bearer {token}",
+        "X-GitHub-Api-Version": "2022-11-28"
+    }
+    cached = snapshot.page(url) if snapshot else None
+    if cached:
+        headers["If-None-Match"] = cached["etag"]
+    response = client.get(url, headers=headers)
+    response.raise_for_status()
+    next_url = response.links.get("next", {}).get("url")
+    if response.status_code == 304:
+        return cached["body"], next_url
+    body = response.json()
+    if snapshot and response.headers.get("ETag"):
+        snapshot.set_page(url, response.headers["ETag"], body)
+    return body, next_url
+
+
+def get_copilot_activity(org: str, token: str, snapshot: Optional[SeatSnapshot] = None,
+                         per_page: int = SEATS_PER_PAGE) -> Dict[str, Any]:
+    """
+    Query GitHub Copilot activity for all users in an organization.
+
+    The first page gives total_seats; the remaining pages are then fetched
+    concurrently. When total_seats is missing the Link header's next URL is
+    followed instead.
+
     Args:
         org: GitHub organization name
         token: Personal access token with required scopes: OAuth app tokens 
                and personal access tokens (classic) need either the 
                manage_billing:copilot or read:org scopes to use this endpoint.
-    
+        snapshot: Optional SeatSnapshot used for conditional requests
+        per_page: Seats per page, at most 100
+
+    Returns:
+        Dictionary with total_seats and the seats of every page
+    """
+    url = f"https://api.github.com/orgs/{org}/copilot/billing/seats?per_page={per_page}"
+    first, next_url = _get_seat_page(f"{url}&page=1", token, snapshot)
+    seats = list(first.get("seats", []))
+
+    total_seats = first.get("total_seats")
+    if total_seats is not None:
+        page_urls = [f"{url}&page={page}" for page in range(2, math.ceil(total_seats / per_page) + 1)]
+        for page, _ in client.map(lambda page_url: _get_seat_page(page_url, token, snapshot), page_urls):
+            seats.extend(page.get("seats", []))
+    else:
+        while next_url:
+            page, next_url = _get_seat_page(next_url, token, snapshot)
+            seats.extend(page.get("seats", []))
+
+    return {"total_seats": total_seats if total_seats is not None else len(seats), "seats": seats}
+
+
+async def _get_seat_page_async(http: httpx.AsyncClient, url: str, token: str,
+                               snapshot: Optional[SeatSnapshot] = None, max_retries: int = 5) -> Dict[str, Any]:
+    """
+    Async version of _get_seat_page, retrying throttled responses like ThrottledClient.
+
     Returns:
-        JSON response as a dictionary
+        The page body, from the snapshot on 304 Not Modified
     """
-    url = f"https://api.github.com/orgs/{org}/copilot/billing/seats"
     headers = {
         "Accept": "application/vnd.github+json",
         "Authorization": f"Bearer {token}",
         "X-GitHub-Api-Version": "2022-11-28"
     }
-    response = requests.get(url, headers=headers)
+    cached = snapshot.page(url) if snapshot else None
+    if cached:
+        headers["If-None-Match"] = cached["etag"]
+    for attempt in range(max_retries + 1):
+        response = await http.get(url, headers=headers)
+        delay = ThrottledClient.throttle_delay(response, attempt)
+        if delay is None or attempt == max_retries:
+            break
+        await asyncio.sleep(delay)
+    if response.status_code == 304:
+        return cached["body"]
     response.raise_for_status()
-    return response.json()
+    body = response.json()
+    if snapshot and response.headers.get("ETag"):
+        snapshot.set_page(url, response.headers["ETag"], body)
+    return body
+
+
+async def _collect_source(http: httpx.AsyncClient, source: str, token: str, snapshot: Optional[SeatSnapshot],
+                          concurrency: int, per_page: int) -> Dict[str, Any]:
+    """
+    Fetch every seat page of one organization ("orgs/NAME") or enterprise ("enterprises/NAME"),
+    with at most concurrency requests in flight for it.
+    """
+    url = f"https://api.github.com/{source}/copilot/billing/seats?per_page={per_page}"
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(page: int) -> Dict[str, Any]:
+        async with semaphore:
+            return await _get_seat_page_async(http, f"{url}&page={page}", token, snapshot)
+
+    first = await fetch(1)
+    total_seats = first.get("total_seats", 0)
+    pages = await asyncio.gather(*(fetch(page) for page in range(2, math.ceil(total_seats / per_page) + 1)))
+    seats = [seat for page in [first, *pages] for seat in page.get("seats", [])]
+    return {"total_seats": total_seats, "seats": seats}
+
+
+async def collect_copilot_activity(orgs: List[str], token: str, enterprise: Optional[str] = None,
+                                   snapshot: Optional[SeatSnapshot] = None, org_concurrency: int = 4,
+                                   max_connections: int = 20,
+                                   per_page: int = SEATS_PER_PAGE) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch the seats of several organizations (and optionally an enterprise) concurrently.
+
+    All sources share one pooled httpx.AsyncClient, so a refresh takes about as
+    long as the slowest organization rather than the sum of all of them.
+
+    Args:
+        orgs: GitHub organization names
+        token: Personal access token, see get_copilot_activity
+        enterprise: Optional enterprise whose seats are also collected
+        snapshot: Optional SeatSnapshot used for conditional requests
+        org_concurrency: Page requests in flight per organization
+        max_connections: Connections in the shared pool across all organizations
+        per_page: Seats per page, at most 100
+
+    Returns:
+        Dictionary mapping each organization (or enterprise) name to its total_seats and seats;
+        a source that failed maps to {"error": message}
+    """
+    sources = {org: f"orgs/{org}" for org in orgs}
+    if enterprise:
+        sources[enterprise] = f"enterprises/{enterprise}"
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as http:
+        results = await asyncio.gather(
+            *(_collect_source(http, source, token, snapshot, org_concurrency, per_page) for source in sources.values()),
+            return_exceptions=True,
+        )
+    return {name: result if not isinstance(result, Exception) else {"error": str(result)}
+            for name, result in zip(sources, results)}
+
+
+def merge_seats(results: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge the seats of several organizations into one list with one seat per login.
+
+    The seat with the most recent last_activity_at is kept, and its orgs field
+    lists every organization the login holds a seat in.
+
+    Args:
+        results: Result of collect_copilot_activity
+
+    Returns:
+        List of seats, one per login
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for name, data in results.items():
+        for seat in data.get("seats", []):
+            login = (seat.get("assignee") or {}).get("login")
+            current = merged.get(login)
+            if current is None:
+                merged[login] = {**seat, "orgs": [name]}
+                continue
+            current["orgs"].append(name)
+            # ISO 8601 timestamps in UTC compare correctly as strings
+            if (seat.get("last_activity_at") or "") > (current.get("last_activity_at") or ""):
+                merged[login] = {**seat, "orgs": current["orgs"]}
+    return list(merged.values())
 
 def extract_user_activity_info(data: Dict[str, Any]) -> List[Dict[str, str]]:
     """
@@ -82,17 +296,175 @@ def print_user_activity_summary(data: Dict[str, Any]) -> None:
         print(f"  Last activity editor: {user_info['last_activity_editor']}")
         print()
 
+def seats_to_frame(seats: List[Dict[str, Any]], org: Optional[str] = None) -> pd.DataFrame:
+    """
+    Load seats into a columnar DataFrame with parsed UTC timestamps.
+
+    Args:
+        seats: Seats retrieved from GitHub API
+        org: Optional organization name stored in an org column
+
+    Returns:
+        DataFrame with login, last_activity_at, last_activity_editor, editor and created_at columns
+    """
+    frame = pd.DataFrame({
+        # string dtype keeps the .str accessor working for orgs with no seats or no editor data
+        "login": pd.Series([(seat.get("assignee") or {}).get("login") for seat in seats], dtype="string"),
+        "last_activity_at": pd.to_datetime([seat.get("last_activity_at") for seat in seats], utc=True),
+        "last_activity_editor": pd.Series([seat.get("last_activity_editor") for seat in seats], dtype="string"),
+        "created_at": pd.to_datetime([seat.get("created_at") for seat in seats], utc=True),
+    })
+    # last_activity_editor looks like "vscode/1.85.1/copilot/1.143.0"; the editor is the first part
+    frame["editor"] = frame["last_activity_editor"].str.split("/", n=1).str[0].fillna("none")
+    if org is not None:
+        frame.insert(0, "org", org)
+    return frame
+
+
+def analyze_activity(frame: pd.DataFrame, idle_days: int = 30,
+                     now: Optional[pd.Timestamp] = None) -> Dict[str, Any]:
+    """
+    Compute inactivity buckets, per-editor counts and the idle seats with vectorized operations.
+
+    Args:
+        frame: DataFrame from seats_to_frame
+        idle_days: Seats without activity for longer than this are listed as idle
+        now: Reference time, the current time by default
+
+    Returns:
+        Dictionary with total, buckets, editors (both pandas Series of counts) and idle (a DataFrame)
+    """
+    now = now if now is not None else pd.Timestamp.now(tz="UTC")
+    frame = frame.assign(days_idle=(now - frame["last_activity_at"]).dt.days)
+    edges = [-np.inf] + INACTIVITY_BUCKETS + [np.inf]
+    labels = [f"<= {INACTIVITY_BUCKETS[0]} days"] + [
+        f"{low + 1}-{high} days" for low, high in zip(INACTIVITY_BUCKETS, INACTIVITY_BUCKETS[1:])
+    ] + [f"> {INACTIVITY_BUCKETS[-1]} days"]
+    buckets = pd.cut(frame["days_idle"], bins=edges, labels=labels).cat.add_categories(["never active"])
+    buckets = buckets.fillna("never active").value_counts(sort=False).rename_axis(None)
+
+    idle = frame[frame["last_activity_at"].isna() | (frame["days_idle"] > idle_days)]
+    return {
+        "total": len(frame),
+        "buckets": buckets,
+        "editors": frame["editor"].value_counts().rename_axis(None),
+        "idle": idle.sort_values("last_activity_at", na_position="first"),
+    }
+
+
+def write_frame(frame: pd.DataFrame, path: str) -> None:
+    """
+    Write a DataFrame in one call, as Parquet for a .parquet path (needs pyarrow or fastparquet) and CSV otherwise.
+    """
+    if path.endswith(".parquet"):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+
+def print_activity_report(report: Dict[str, Any], idle_days: int, show_idle: int = 20) -> None:
+    """
+    Print the summarized analytics report instead of one block per seat.
+
+    Args:
+        report: Result of analyze_activity
+        idle_days: Threshold used for the idle list
+        show_idle: Number of idle seats listed; the rest are only counted
+    """
+    print("=" * 80)
+    print("GitHub Copilot User Activity Report")
+    print("=" * 80)
+    print(f"Total users: {report['total']}")
+    print()
+    print("Days since last activity:")
+    print(report["buckets"].to_string())
+    print()
+    print("Last used editor:")
+    print(report["editors"].to_string())
+    print()
+    idle = report["idle"]
+    print(f"Idle for more than {idle_days} days: {len(idle)}")
+    if len(idle):
+        print(idle.head(show_idle)[["login", "last_activity_at", "editor"]].to_string(index=False))
+        if len(idle) > show_idle:
+            print(f"... and {len(idle) - show_idle} more")
+
 if __name__ == "__main__":
     # Example usage:
     # Replace 'ORG', 'YOUR-TOKEN' with actual values
     org = 'your-organization'
     token = 'your-github-token'
-    
+
+    parser = argparse.ArgumentParser(description="Report GitHub Copilot seat activity.")
+    parser.add_argument("--org", action="append", help="organization to report (repeatable)")
+    parser.add_argument("--enterprise", help="also collect the seats billed to this enterprise")
+    parser.add_argument("--org-concurrency", type=int, default=4,
+                        help="page requests in flight per organization when several are collected")
+    parser.add_argument("--token", default=token, help="personal access token")
+    parser.add_argument("--snapshot", default="copilot_seats_snapshot.json",
+                        help="file keeping page ETags and seat activity between runs")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="only report seats whose last activity changed since the previous run")
+    parser.add_argument("--analytics", action="store_true",
+                        help="print inactivity buckets, editor counts and idle seats instead of every seat")
+    parser.add_argument("--idle-days", type=int, default=30, help="seats idle longer than this are listed in analytics mode")
+    parser.add_argument("--output", help="analytics mode: write all seats to this .parquet or .csv file")
+    args = parser.parse_args()
+    snapshot = SeatSnapshot(args.snapshot)
+
     try:
-        data = get_copilot_activity(org, token)
-        
-        # Print user activity summary
-        print_user_activity_summary(data)
+        if len(args.org or []) > 1 or args.enterprise:
+            # several sources are fetched at once and merged into one seat per login
+            results = asyncio.run(collect_copilot_activity(args.org or [], args.token, args.enterprise, snapshot,
+                                                           args.org_concurrency))
+            for name, result in results.items():
+                if "error" in result:
+                    print(f"{name}: {result['error']}")
+                    continue
+                changed = snapshot.changed_seats(name, result["seats"])
+                if args.changed_only:
+                    print(f"{name}: {len(changed)} of {result['total_seats']} seats changed since the previous run")
+                    result["seats"] = changed
+            snapshot.save()
+            seats = merge_seats(results)
+            print(f"Collected {len(seats)} unique users from {len(results)} sources.")
+            if args.analytics:
+                frame = seats_to_frame(seats)
+                frame.insert(0, "orgs", [",".join(seat["orgs"]) for seat in seats])
+                print_activity_report(analyze_activity(frame, args.idle_days), args.idle_days)
+                if args.output:
+                    write_frame(frame, args.output)
+                    print(f"Wrote {len(frame)} seats to {args.output}.")
+            else:
+                print_user_activity_summary({"total_seats": len(seats), "seats": seats})
+            raise SystemExit(0)
+
+        if args.analytics:
+            frames = []
+            for name in args.org or [org]:
+                data = get_copilot_activity(name, args.token, snapshot)
+                changed = snapshot.changed_seats(name, data["seats"])
+                if args.changed_only:
+                    print(f"{name}: {len(changed)} of {data['total_seats']} seats changed since the previous run")
+                frames.append(seats_to_frame(changed if args.changed_only else data["seats"], name))
+            frame = pd.concat(frames, ignore_index=True)
+            snapshot.save()
+            print_activity_report(analyze_activity(frame, args.idle_days), args.idle_days)
+            if args.output:
+                write_frame(frame, args.output)
+                print(f"Wrote {len(frame)} seats to {args.output}.")
+            raise SystemExit(0)
+
+        for org in args.org or [org]:
+            data = get_copilot_activity(org, args.token, snapshot)
+            changed = snapshot.changed_seats(org, data["seats"])
+            if args.changed_only:
+                print(f"{org}: {len(changed)} of {data['total_seats']} seats changed since the previous run")
+                data = {"total_seats": data["total_seats"], "seats": changed}
+
+            # Print user activity summary
+            print_user_activity_summary(data)
+        snapshot.save()
         
         # Uncomment the line below if you need raw data
         # print("Raw data:", data)
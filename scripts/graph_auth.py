@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+
+import msal
+import requests
+
+GRAPH_SCOPE = ["https://graph.microsoft.com/.default"]
+
+
+class TokenProvider(requests.auth.AuthBase):
+    """
+    App-only Graph token source shared by all workers of a long-running job.
+
+    One MSAL application and its token cache are reused for the whole run, the
+    token is refreshed before it expires, and the cache can be persisted to disk
+    so a restarted job does not request a new token. Pass the provider as
+    ``auth=`` on each request so every call picks up the current token.
+    """
+
+    def __init__(self, client_id, client_secret, tenant_id, scopes=GRAPH_SCOPE, cache_path=None,
+                 refresh_margin=300):
+        """
+        Args:
+            client_id: application (client) id.
+            client_secret: client secret.
+            tenant_id: directory (tenant) id.
+            scopes: scopes to request, Graph .default by default.
+            cache_path: optional file used to persist the MSAL token cache.
+            refresh_margin: seconds before expiry at which the token is refreshed.
+        """
+        self.scopes = scopes
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin
+        self.cache = msal.SerializableTokenCache()
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                self.cache.deserialize(f.read())
+        self.app = msal.ConfidentialClientApplication(
+            client_id,
+            authority=f"https://login.microsoftonline.com/{tenant_id}",
+            client_credential=client_secret,
+            token_cache=self.cache,
+        )
+        self.lock = threading.Lock()
+        self.token = None
+        self.expires_at = 0.0
+
+    def get_token(self):
+        """Return a token that is valid for at least refresh_margin seconds."""
+        with self.lock:
+            if self.token and time.time() < self.expires_at - self.refresh_margin:
+                return self.token
+
+            result = self.app.acquire_token_for_client(scopes=self.scopes)
+            if 'access_token' in result and int(result.get('expires_in', 0)) <= self.refresh_margin:
+                # MSAL served a cached token that is about to expire; drop it and ask for a new one
+                for item in self.cache.find(msal.TokenCache.CredentialType.ACCESS_TOKEN):
+                    self.cache.remove_at(item)
+                result = self.app.acquire_token_for_client(scopes=self.scopes)
+            if 'access_token' not in result:
+                raise RuntimeError(f"Could not acquire token: {result.get('error')}: {result.get('error_description')}")
+
+            self.token = result['access_token']
+            self.expires_at = time.time() + int(result.get('expires_in', 0))
+            self._save_cache()
+            return self.token
+
+    def _save_cache(self):
+        if not self.cache_path or not self.cache.has_state_changed:
+            return
+        # write to a temp file first so concurrent readers never see a partial cache
+        with open(self.cache_path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(self.cache.serialize())
+        os.replace(self.cache_path + '.tmp', self.cache_path)
+        self.cache.has_state_changed = False
+
+    def __call__(self, request):
+        request.headers['Authorization'] = f'Bearer {self.get_token()}'
+        return request
+
+
+class StaticToken(requests.auth.AuthBase):
+    """Auth for a token obtained elsewhere, e.g. passed on the command line."""
+
+    def __init__(self, token):
+        self.token = token
+
+    def get_token(self):
+        return self.token
+
+    def __call__(self, request):
+        request.headers['Authorization'] = f'Bearer {self.token}'
+        return request
+
+
+def as_auth(access_token):
+    """Accept either a TokenProvider or a plain token string and return a requests auth object."""
+    if isinstance(access_token, requests.auth.AuthBase):
+        return access_token
+    return StaticToken(access_token)
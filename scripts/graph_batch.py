@@ -0,0 +1,118 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+import requests
+
+GRAPH_URL = 'https://graph.microsoft.com/v1.0'
+
+# Graph accepts at most 20 sub-requests in one JSON $batch request
+MAX_BATCH_SIZE = 20
+
+
+def _retry_after(headers, default=1.0):
+    try:
+        return float((headers or {}).get('Retry-After', default))
+    except (TypeError, ValueError):
+        return default
+
+
+def send_batch(client, auth, batch, graph_url=GRAPH_URL, max_retries=5):
+    """
+    Send one JSON $batch request and return its sub-responses keyed by id.
+
+    Throttling of the $batch request itself is handled by the client; sub-requests
+    throttled with 429 are re-sent after their Retry-After delay and other
+    sub-responses are returned as they are.
+
+    Args:
+        client: ThrottledClient (or requests.Session) used to send the request.
+        auth: requests auth supplying the bearer token, e.g. graph_auth.TokenProvider.
+        batch: list of at most 20 sub-requests, each with a unique "id".
+        graph_url: Graph base URL, e.g. https://graph.microsoft.com/v1.0.
+        max_retries: number of times throttled requests are re-sent.
+
+    Returns:
+        dict: sub-request id -> sub-response ({"id", "status", "headers", "body"}).
+    """
+    results = {}
+    pending = list(batch)
+    for attempt in range(max_retries + 1):
+        response = client.post(f'{graph_url}/$batch', auth=auth, json={'requests': pending})
+        if response.status_code != 200:
+            for request in pending:
+                results[request['id']] = {'id': request['id'], 'status': response.status_code,
+                                          'body': {'error': {'message': response.text}}}
+            return results
+
+        throttled = []
+        delay = 0.0
+        for sub_response in response.json().get('responses', []):
+            if sub_response['status'] == 429 and attempt < max_retries:
+                throttled.append(sub_response['id'])
+                delay = max(delay, _retry_after(sub_response.get('headers')))
+            else:
+                results[sub_response['id']] = sub_response
+        if not throttled:
+            return results
+        pending = [request for request in pending if request['id'] in throttled]
+        time.sleep(delay)
+    return results
+
+
+def run_batches(client, auth, batch_requests, batch_size=MAX_BATCH_SIZE, concurrency=4,
+                graph_url=GRAPH_URL):
+    """
+    Pack sub-requests into $batch requests and send several batches concurrently.
+
+    batch_requests is consumed lazily, a batch at a time, as earlier batches
+    finish; only about twice concurrency batches are held in memory, so it can be
+    a generator over an input file of any size. If the generator raises (e.g. on
+    an invalid input row), the sub-requests read before the error are still sent
+    and every batch in flight is yielded before the error is re-raised.
+
+    Args:
+        client: ThrottledClient (or requests.Session) used to send the requests.
+        auth: requests auth supplying the bearer token, pulled again for every request.
+        batch_requests: sub-requests, each with a unique "id".
+        batch_size: sub-requests per $batch request (at most 20).
+        concurrency: number of $batch requests in flight.
+        graph_url: Graph base URL.
+
+    Yields:
+        dict: each sub-response as soon as its batch finishes.
+    """
+    batch_size = min(batch_size, MAX_BATCH_SIZE)
+    pending = iter(batch_requests)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {}
+        input_error = None
+
+        def submit_next():
+            nonlocal input_error
+            batch = []
+            if input_error is None:
+                try:
+                    batch.extend(islice(pending, batch_size))
+                except Exception as e:
+                    # keep the rows read so far; stop reading and report the error after draining
+                    input_error = e
+            if batch:
+                futures[executor.submit(send_batch, client, auth, batch, graph_url)] = batch
+
+        for _ in range(2 * concurrency):
+            submit_next()
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = futures.pop(future)
+                submit_next()
+                try:
+                    results = future.result()
+                except requests.RequestException as e:
+                    results = {request['id']: {'id': request['id'], 'status': 0,
+                                               'body': {'error': {'message': str(e)}}}
+                               for request in batch}
+                yield from results.values()
+    if input_error is not None:
+        raise input_error
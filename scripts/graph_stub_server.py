@@ -0,0 +1,129 @@
+# Local stand-in for the Microsoft Graph user and app role assignment endpoints,
+# used to measure add_aad_users.py / add_aaduser_emu.py throughput without
+# touching a real tenant. Every user principal name resolves; its id is the UPN.
+#
+# python graph_stub_server.py --port 8080 --latency 0.2
+# python add_aad_users.py --bulk --graph-url http://127.0.0.1:8080/v1.0 --access-token dummy
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+created_users = set()
+# (principalId, resourceId, appRoleId)
+assignments = set()
+lock = threading.Lock()
+
+
+def create_user(body):
+    upn = body.get('userPrincipalName')
+    with lock:
+        if upn in created_users:
+            return 400, {"error": {"code": "Request_BadRequest",
+                                   "message": "Another object with the same value for property userPrincipalName already exists."}}
+        created_users.add(upn)
+    return 201, {"id": upn, "userPrincipalName": upn}
+
+
+def get_user(upn):
+    return 200, {"id": upn, "userPrincipalName": upn}
+
+
+def create_assignment(body):
+    key = (body.get('principalId'), body.get('resourceId'), body.get('appRoleId'))
+    with lock:
+        if key in assignments:
+            return 400, {"error": {"code": "Request_BadRequest", "message": "Permission being assigned already exists on the object"}}
+        assignments.add(key)
+    return 201, dict(zip(("principalId", "resourceId", "appRoleId"), key))
+
+
+def list_assigned_to(resource_id, query):
+    skip = int(query.get('$skiptoken', ['0'])[0])
+    top = int(query.get('$top', ['100'])[0])
+    with lock:
+        items = sorted(a for a in assignments if a[1] == resource_id)
+    page = [{"principalId": p, "appRoleId": r} for p, _, r in items[skip:skip + top]]
+    payload = {"value": page}
+    if skip + top < len(items):
+        payload["@odata.nextLink"] = (f"/v1.0/servicePrincipals/{resource_id}/appRoleAssignedTo"
+                                      f"?$top={top}&$skiptoken={skip + top}")
+    return 200, payload
+
+
+def route(method, path, body):
+    """Dispatch one request (top-level or $batch sub-request) to the stub handlers."""
+    parts = urlsplit(path)
+    url = re.sub(r'^/v1\.0', '', parts.path)
+    query = parse_qs(parts.query)
+    if method == 'POST' and url == '/users':
+        return create_user(body)
+    match = re.fullmatch(r'/users/([^/]+)/appRoleAssignments', url)
+    if method == 'POST' and match:
+        return create_assignment(body)
+    match = re.fullmatch(r'/users/([^/]+)', url)
+    if method == 'GET' and match:
+        return get_user(unquote(match.group(1)))
+    match = re.fullmatch(r'/servicePrincipals/([^/]+)/appRoleAssignedTo', url)
+    if method == 'GET' and match:
+        return list_assigned_to(unquote(match.group(1)), query)
+    return 404, {"error": {"code": "NotFound", "message": path}}
+
+
+class GraphStubHandler(BaseHTTPRequestHandler):
+    latency = 0.2
+    item_latency = 0.01
+    base_url = ''
+    protocol_version = 'HTTP/1.1'
+
+    def handle_request(self, method):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        time.sleep(self.latency)
+        if method == 'POST' and self.path == '/v1.0/$batch':
+            responses = []
+            for request in body.get('requests', []):
+                time.sleep(self.item_latency)
+                sub_status, sub_body = route(request['method'], request['url'], request.get('body', {}))
+                responses.append({"id": request['id'], "status": sub_status, "body": sub_body})
+            status, payload = 200, {"responses": responses}
+        else:
+            status, payload = route(method, self.path, body)
+        if '@odata.nextLink' in payload:
+            payload['@odata.nextLink'] = self.base_url + payload['@odata.nextLink']
+        self.send_json(status, payload)
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a stub Graph server for users, app role assignments and $batch.")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds added to every HTTP request")
+    parser.add_argument("--item-latency", type=float, default=0.01, help="seconds added per $batch sub-request")
+    args = parser.parse_args()
+
+    GraphStubHandler.latency = args.latency
+    GraphStubHandler.item_latency = args.item_latency
+    GraphStubHandler.base_url = f'http://127.0.0.1:{args.port}'
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), GraphStubHandler)
+    print(f"Graph stub listening on http://127.0.0.1:{args.port}/v1.0")
+    server.serve_forever()
@@ -0,0 +1,66 @@
+# the verb for each counted action, used in failure messages
+VERBS = {'added': 'add', 'removed': 'remove'}
+
+
+def diff_members(current, desired, remove=False):
+    """
+    Compare current and desired members with set operations.
+
+    Logins are compared case-insensitively, as GitHub does; the desired spelling
+    is kept for additions and the current one for removals.
+
+    Args:
+        current: logins that are members now (or have a pending invitation).
+        desired: logins that should be members.
+        remove: also return current members who are not desired.
+
+    Returns:
+        tuple: (to_add, to_remove), both sorted lists of logins.
+    """
+    current = {login.lower(): login for login in current}
+    desired = {login.lower(): login for login in desired}
+    to_add = sorted(desired[key] for key in desired.keys() - current.keys())
+    to_remove = sorted(current[key] for key in current.keys() - desired.keys()) if remove else []
+    return to_add, to_remove
+
+
+def apply_delta(client, name, to_add, to_remove, add, remove, dry_run=False):
+    """
+    Apply a membership delta concurrently on the client's bounded, rate-limited pool.
+
+    Args:
+        client: ThrottledClient whose pool runs the calls.
+        name: team or organization name used in the printed summary.
+        to_add: logins to add.
+        to_remove: logins to remove.
+        add: function(login) -> HTTP status code.
+        remove: function(login) -> HTTP status code.
+        dry_run: only print the delta.
+
+    Returns:
+        dict: counts of added, removed and failed logins; in a dry run, the counts that would be applied.
+    """
+    if dry_run:
+        for login in to_add:
+            print(f"{name}: would add {login}")
+        for login in to_remove:
+            print(f"{name}: would remove {login}")
+        return {'added': len(to_add), 'removed': len(to_remove), 'failed': 0}
+
+    counts = {'added': 0, 'removed': 0, 'failed': 0}
+
+    def run(change):
+        action, login = change
+        status_code = add(login) if action == 'added' else remove(login)
+        return action, login, status_code
+
+    changes = [('added', login) for login in to_add] + [('removed', login) for login in to_remove]
+    for action, login, status_code in client.map(run, changes):
+        if status_code < 300:
+            counts[action] += 1
+        else:
+            counts['failed'] += 1
+            print(f"{name}: could not {VERBS[action]} {login}: {status_code}")
+    if changes:
+        print(f"{name}: {counts['added']} added, {counts['removed']} removed, {counts['failed']} failed.")
+    return counts
@@ -1,9 +1,15 @@
+import argparse
 import os
+import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, List, Optional
 
 from openai import AzureOpenAI
 
+import llm_cache
+
 PROMPT = (
     "From the provided source text, locate the table whose first header cell is \"File\". "
     "If no such table exists, output exactly \"No Code Review Result Generated\". "
@@ -30,6 +36,245 @@ PROMPT = (
 )
 
 
+SYSTEM_PROMPT = "You are a meticulous code review formatter who never alters substantive content."
+
+# Inputs longer than this many characters are split into chunks that are repaired in parallel.
+CHUNK_CHARS = 12000
+
+SEPARATOR_PATTERN = re.compile(r"^\s*\|?\s*:?-{3,}")
+
+# one cell of a well-formed separator row
+SEPARATOR_CELL = re.compile(r":?-{3,}:?")
+
+NO_RESULT = "No Code Review Result Generated\n"
+
+COLUMNS = ["File", "Concern", "Recommendation", "Severity"]
+
+# severities the review prompt asks for, plus common synonyms; used to recognise concatenated rows
+SEVERITIES = {"info", "minor", "major", "critical", "low", "medium", "high"}
+
+# pipes not escaped with a backslash delimit cells
+CELL_DELIMITER = re.compile(r"(?<!\\)\|")
+
+
+def is_header_line(line: str) -> bool:
+    """Return True when the first cell of a table line is "File"."""
+    return line.strip().lstrip("|").split("|", 1)[0].strip() == "File"
+
+
+def split_cells(line: str, collapse: bool = False) -> List[str]:
+    """
+    Split a table line into trimmed cells, ignoring one leading and one trailing pipe.
+
+    With collapse, runs of pipes ("||") count as a single delimiter.
+    """
+    line = line.strip()
+    if collapse:
+        line = re.sub(r"(?<!\\)\|(\s*\|)+", "|", line)
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    return [cell.strip() for cell in CELL_DELIMITER.split(line)]
+
+
+def is_valid_separator(line: str) -> bool:
+    """Return True when a separator row has exactly one well-formed cell per column."""
+    cells = split_cells(line)
+    return len(cells) == len(COLUMNS) and all(SEPARATOR_CELL.fullmatch(cell) for cell in cells)
+
+
+def split_rows(cells: List[str]) -> Optional[List[List[str]]]:
+    """
+    Return the cells of one line as rows of four, or None when they do not form
+    whole rows with a severity in every fourth cell.
+    """
+    if not cells or len(cells) % len(COLUMNS):
+        return None
+    rows = [cells[i:i + len(COLUMNS)] for i in range(0, len(cells), len(COLUMNS))]
+    if len(rows) > 1 and not all(row[-1].lower() in SEVERITIES for row in rows):
+        return None
+    return rows
+
+
+def repair_locally(source_text: str) -> Optional[str]:
+    """
+    Apply the PROMPT rules without the model when the table is unambiguous.
+
+    Handles input without any table, a missing or malformed separator row, "||" runs, inconsistent
+    leading/trailing pipes, a header crammed onto one line with data, and
+    concatenated rows with a clear four-column pattern. A table that is already
+    valid is returned verbatim.
+
+    Returns:
+        The repaired table, or None when the model is needed.
+    """
+    if "|" not in source_text:
+        return NO_RESULT
+    lines = source_text.splitlines()
+    header_index = next((i for i, line in enumerate(lines) if is_header_line(line)), None)
+    if header_index is None:
+        return None
+
+    table = []
+    rest = lines[header_index:]
+    for index, line in enumerate(rest):
+        if not line.strip():
+            # blank lines inside the table do not end it
+            continue
+        if "|" not in line:
+            # more table lines after prose are ambiguous; the model decides which rows belong to the table
+            if any("|" in later for later in rest[index + 1:]):
+                return None
+            break
+        table.append(line.rstrip())
+
+    header_cells = split_cells(table[0])
+    if header_cells[:len(COLUMNS)] != COLUMNS:
+        return None
+    if len(header_cells) > len(COLUMNS) and split_rows(header_cells[len(COLUMNS):]) is None:
+        header_cells = split_cells(table[0], collapse=True)
+    has_separator = len(table) > 1 and SEPARATOR_PATTERN.match(table[1]) is not None
+    data_lines = table[2:] if has_separator else table[1:]
+
+    rows = []
+    # GFM does not render a table whose separator has a different cell count than its header
+    valid = has_separator and is_valid_separator(table[1]) and len(header_cells) == len(COLUMNS)
+    # the header line may also carry data rows when the table was flattened onto one line
+    extra = header_cells[len(COLUMNS):]
+    if extra:
+        line_rows = split_rows(extra)
+        if line_rows is None:
+            return None
+        rows.extend(line_rows)
+    for line in data_lines:
+        if SEPARATOR_PATTERN.match(line):
+            valid = False
+            continue
+        line_rows = split_rows(split_cells(line))
+        if line_rows is None or len(line_rows) > 1:
+            valid = False
+            line_rows = split_rows(split_cells(line, collapse=True)) if line_rows is None else line_rows
+        if line_rows is None:
+            return None
+        rows.extend(line_rows)
+
+    edges = {(line.lstrip().startswith("|"), line.endswith("|")) for line in table}
+    if valid and len(edges) == 1:
+        return "\n".join(table) + "\n"
+
+    rendered = [COLUMNS, ["---"] * len(COLUMNS)] + rows
+    return "".join("| " + " | ".join(row) + " |\n" for row in rendered)
+
+
+def split_table(source_text: str, chunk_chars: int = CHUNK_CHARS) -> List[str]:
+    """
+    Split the source into chunks of at most about chunk_chars characters on table-row boundaries.
+
+    Every chunk repeats the header (and separator, when present) so it can be
+    repaired on its own. Lines that do not start with a pipe stay with the row
+    above them. A source without a "File" header, or one below the threshold,
+    is returned as a single chunk.
+    """
+    lines = source_text.splitlines(keepends=True)
+    header_index = next((i for i, line in enumerate(lines) if is_header_line(line)), None)
+    if len(source_text) <= chunk_chars or header_index is None:
+        return [source_text]
+
+    body_start = header_index + 1
+    if body_start < len(lines) and SEPARATOR_PATTERN.match(lines[body_start]):
+        body_start += 1
+    header = "".join(lines[header_index:body_start])
+
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in lines[body_start:]:
+        if current and size + len(line) > chunk_chars and line.lstrip().startswith("|"):
+            chunks.append(header + "".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line)
+    if current or not chunks:
+        chunks.append(header + "".join(current))
+    return chunks
+
+
+def strip_table_header(text: str) -> str:
+    """Remove the header and separator lines from a repaired chunk so only data rows remain."""
+    lines = text.splitlines(keepends=True)
+    while lines and (is_header_line(lines[0]) or SEPARATOR_PATTERN.match(lines[0])):
+        lines.pop(0)
+    return "".join(lines)
+
+
+def repair(client: AzureOpenAI, model: str, source_text: str, max_output_tokens: int, verbosity: int = 0,
+           on_delta: Optional[Callable[[str], None]] = None, cache: Optional[llm_cache.LLMCache] = None) -> str:
+    """
+    Repair one chunk, streaming the response.
+
+    Args:
+        client: Azure OpenAI client.
+        model: Deployment name.
+        source_text: Table text to repair.
+        max_output_tokens: Output token limit for this chunk.
+        verbosity: 1 prints request sizes, 2 also prints the prompt and the final response.
+        on_delta: Called with each piece of output text as it arrives.
+        cache: Optional LLMCache; a hit is returned without calling the model, and
+            complete responses are stored in it.
+
+    Returns:
+        The repaired text.
+    """
+    prompt = f"{PROMPT}{source_text}"
+    if verbosity >= 2:
+        print(f"prompt: {prompt}")
+    elif verbosity:
+        print(f"prompt: {len(prompt)} characters")
+
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.key(endpoint=str(client.base_url), model=model, system=SYSTEM_PROMPT, prompt=prompt,
+                              max_output_tokens=max_output_tokens)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            if verbosity:
+                print(f"cache hit: {cache_key}")
+            if on_delta is not None:
+                on_delta(cached)
+            return cached
+
+    pieces: List[str] = []
+    complete = False
+    stream = client.responses.create(
+        model=model,
+        input=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        max_output_tokens=max_output_tokens,
+        stream=True,
+    )
+    for event in stream:
+        if event.type == "response.output_text.delta":
+            pieces.append(event.delta)
+            if on_delta is not None:
+                on_delta(event.delta)
+        elif event.type in ("response.completed", "response.incomplete"):
+            if verbosity >= 2:
+                print(f"response: {event.response}")
+            if event.type == "response.incomplete":
+                print(f"Response incomplete: {event.response.incomplete_details}", file=sys.stderr)
+            complete = event.type == "response.completed"
+        elif event.type in ("response.failed", "error"):
+            raise RuntimeError(f"Review repair failed: {event}")
+    output_text = "".join(pieces)
+    # truncated responses are not cached so that a retry can produce the full table
+    if cache_key is not None and complete:
+        cache.set(cache_key, output_text)
+    return output_text
+
+
 def require_env(name: str) -> str:
     value = os.environ.get(name)
     if not value:
@@ -39,13 +284,38 @@ def require_env(name: str) -> str:
 
 
 def main() -> None:
-    source_path = Path("raw_review.md")
+    parser = argparse.ArgumentParser(description="Repair the code review table in raw_review.md with Azure OpenAI.")
+    parser.add_argument("--input", default="raw_review.md", help="review text to repair")
+    parser.add_argument("--output", default="review_result.md", help="file the repaired table is streamed to")
+    parser.add_argument("--chunk-chars", type=int, default=CHUNK_CHARS,
+                        help="inputs longer than this are split on table rows and repaired in parallel")
+    parser.add_argument("--max-workers", type=int, default=4, help="chunks repaired at the same time")
+    parser.add_argument("--max-output-tokens", type=int, default=int(os.environ.get("AZURE_OPENAI_MAX_OUTPUT_TOKENS", "8192")),
+                        help="output token limit per chunk")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="-v prints request sizes, -vv also dumps prompts and responses")
+    parser.add_argument("--model-only", action="store_true",
+                        help="always send the table to the model instead of trying the local repair first")
+    parser.add_argument("--cache-dir", help="cache model responses in this directory (default: LLM_CACHE_DIR, off when unset)")
+    parser.add_argument("--cache-ttl", type=float, help="seconds a cached response stays valid (default: LLM_CACHE_TTL or 7 days)")
+    parser.add_argument("--cache-max-mb", type=float,
+                        help="cache size above which least recently used entries are evicted (default: LLM_CACHE_MAX_MB or 50)")
+    args = parser.parse_args()
+
+    source_path = Path(args.input)
     if not source_path.exists():
-        print("raw_review.md not found; cannot repair review output.", file=sys.stderr)
+        print(f"{source_path} not found; cannot repair review output.", file=sys.stderr)
         raise SystemExit(1)
 
     source_text = source_path.read_text(encoding="utf-8")
 
+    # most reviews are already valid or only need mechanical fixes; those never reach the model
+    local_text = None if args.model_only else repair_locally(source_text)
+    if local_text is not None:
+        Path(args.output).write_text(local_text, encoding="utf-8")
+        print(f"Wrote repaired review to {args.output} without calling the model.")
+        return
+
     api_key = require_env("AZURE_OPENAI_API_KEY")
     base_url = require_env("AZURE_OPENAI_BASE_URL")
     api_version = os.environ.get("AZURE_OPENAI_API_VERSION", "2025-03-01-preview")
@@ -57,33 +327,39 @@ def main() -> None:
         azure_endpoint=base_url,
     )
 
-    prompt = f"{PROMPT}{source_text}"
-
-    print(f"prompt: {prompt}")
-
-    response = client.responses.create(
-        model=model,
-        input=[
-            {
-                "role": "system",
-                "content": "You are a meticulous code review formatter who never alters substantive content.",
-            },
-            {"role": "user", "content": prompt},
-        ],
-        max_output_tokens=2048,
-    )
-
-    print(f"response: {response}")
-
-    output_text = response.output_text
-
-    print(f"output_text: {output_text}")
+    cache = llm_cache.from_env(args.cache_dir, args.cache_ttl, args.cache_max_mb)
+    chunks = split_table(source_text, args.chunk_chars)
+    if args.verbose:
+        print(f"{len(source_text)} characters in {len(chunks)} chunk(s)")
 
+    output_path = Path(args.output)
+    try:
+        with output_path.open("w", encoding="utf-8") as output:
+            def write(text: str) -> None:
+                output.write(text)
+                output.flush()
 
-    output_path = Path("review_result.md")
-    if not output_text.endswith("\n"):
-        output_text += "\n"
-    output_path.write_text(output_text, encoding="utf-8")
+            if len(chunks) == 1:
+                # a single request is written to the file as the tokens arrive
+                output_text = repair(client, model, chunks[0], args.max_output_tokens, args.verbose, write, cache)
+            else:
+                # chunks are repaired in parallel and written in order as soon as each one and those before it are done
+                with ThreadPoolExecutor(max_workers=args.max_workers) as executor:
+                    results = executor.map(
+                        lambda chunk: repair(client, model, chunk, args.max_output_tokens, args.verbose, cache=cache), chunks
+                    )
+                    for index, text in enumerate(results):
+                        text = text if index == 0 else strip_table_header(text)
+                        if text and not text.endswith("\n"):
+                            text += "\n"
+                        write(text)
+                        output_text = text
+            if not output_text.endswith("\n"):
+                write("\n")
+    except Exception:
+        # leave no half-written table behind; the workflow falls back to raw_review.md
+        output_path.unlink(missing_ok=True)
+        raise
 
     print(f"Wrote repaired review to {output_path}.")
 
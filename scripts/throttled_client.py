@@ -0,0 +1,210 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+# Requests per second allowed per host before the token bucket makes callers wait.
+# Graph's per-app limits and GitHub's secondary limits both sit well above these;
+# other hosts are only limited when a default_rate is given.
+DEFAULT_HOST_RATES = {
+    'graph.microsoft.com': 20.0,
+    'api.github.com': 10.0,
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit that halves when the server throttles and grows by one
+    after a run of successful requests (AIMD).
+    """
+
+    def __init__(self, initial, maximum, increase_after=20):
+        self.limit = initial
+        self.maximum = maximum
+        self.increase_after = increase_after
+        self.in_flight = 0
+        self.successes = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self.successes = 0
+            else:
+                self.successes += 1
+                if self.successes >= self.increase_after and self.limit < self.maximum:
+                    self.limit += 1
+                    self.successes = 0
+            self.condition.notify_all()
+
+
+class ThrottledClient:
+    """
+    requests wrapper shared by the provisioning scripts.
+
+    Every call goes through a per-host token bucket and an adaptive concurrency
+    limit, and is retried when Graph or GitHub throttle it: Retry-After is honored,
+    and an exhausted X-RateLimit-Remaining pauses the host until X-RateLimit-Reset.
+    """
+
+    def __init__(self, max_workers=8, host_rates=None, default_rate=None, max_retries=5):
+        self.max_workers = max_workers
+        self.host_rates = {**DEFAULT_HOST_RATES, **(host_rates or {})}
+        self.default_rate = default_rate
+        self.max_retries = max_retries
+        self.limit = AdaptiveLimit(max_workers, max_workers)
+        self.buckets = {}
+        self.paused_until = {}
+        self.lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _bucket(self, host):
+        """Return the host's token bucket, or None when the host is not rate limited."""
+        with self.lock:
+            if host not in self.buckets:
+                rate = self.host_rates.get(host, self.default_rate)
+                self.buckets[host] = TokenBucket(rate) if rate else None
+            return self.buckets[host]
+
+    def _wait_for_host(self, host):
+        delay = self.paused_until.get(host, 0) - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    @staticmethod
+    def throttle_delay(response, attempt):
+        """Return how long to wait before retrying, or None if the response is final."""
+        headers = response.headers
+        throttled = response.status_code in (429, 503) or (
+            response.status_code == 403 and (
+                headers.get('X-RateLimit-Remaining') == '0' or 'rate limit' in response.text.lower()
+            )
+        )
+        if not throttled:
+            return None
+        if 'Retry-After' in headers:
+            try:
+                return float(headers['Retry-After'])
+            except ValueError:
+                pass
+        if headers.get('X-RateLimit-Remaining') == '0' and 'X-RateLimit-Reset' in headers:
+            return max(0.0, float(headers['X-RateLimit-Reset']) - time.time())
+        # Full jitter so workers that were throttled together do not retry together
+        return random.uniform(0, min(60.0, 2 ** attempt))
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request under the host's rate limit, retrying throttled responses.
+
+        Returns:
+            requests.Response: the final response, which may still be an error.
+        """
+        host = urlsplit(url).hostname
+        bucket = self._bucket(host)
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_host(host)
+            if bucket is not None:
+                bucket.acquire()
+            self.limit.acquire()
+            response = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            finally:
+                delay = self.throttle_delay(response, attempt) if response is not None else None
+                self.limit.release(throttled=delay is not None)
+
+            if delay is None:
+                # Stop before the primary limit is hit instead of waiting for a 403
+                if response.headers.get('X-RateLimit-Remaining') == '0' and 'X-RateLimit-Reset' in response.headers:
+                    self.paused_until[host] = float(response.headers['X-RateLimit-Reset'])
+                return response
+            if attempt == self.max_retries:
+                return response
+            print(f"Throttled by {host} ({response.status_code}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def paginate(self, url, params=None, **kwargs):
+        """
+        Yield the items of a paginated JSON list, following the Link header's next URL.
+
+        Args:
+            url: first page URL.
+            params: query parameters for the first page; later pages carry their own.
+            **kwargs: passed to every request, e.g. headers or auth.
+        """
+        while url:
+            response = self.get(url, params=params, **kwargs)
+            response.raise_for_status()
+            yield from response.json()
+            url = response.links.get('next', {}).get('url')
+            params = None
+
+    def map(self, fn, items, prefetch=None):
+        """
+        Run fn over items on a bounded thread pool and yield results in input order.
+
+        items is consumed lazily: at most prefetch calls (twice the pool size by
+        default) are queued at once, so a generator over a large input file is
+        never read further ahead than the workers can keep up with.
+        """
+        prefetch = prefetch or 2 * self.max_workers
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = deque()
+            for item in items:
+                if len(futures) >= prefetch:
+                    yield futures.popleft().result()
+                futures.append(executor.submit(fn, item))
+            while futures:
+                yield futures.popleft().result()
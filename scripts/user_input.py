@@ -0,0 +1,84 @@
+import csv
+import json
+import os
+from collections import namedtuple
+
+# one input row: userPrincipalName and the initial password (None when the file has no password column)
+UserRow = namedtuple('UserRow', ['user', 'password'])
+
+FORMATS = ('tsv', 'csv', 'jsonl')
+
+
+def detect_format(path):
+    """Guess the input format from the file extension; .txt files are tab separated like users.txt."""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('csv', 'jsonl'):
+        return extension
+    if extension == 'ndjson':
+        return 'jsonl'
+    return 'tsv'
+
+
+def _raw_rows(f, fmt):
+    """Yield (line number, user, password) without validation."""
+    if fmt == 'jsonl':
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"line {lineno}: invalid JSON: {e}") from None
+            if not isinstance(item, dict):
+                raise ValueError(f"line {lineno}: expected a JSON object")
+            yield lineno, item.get('userPrincipalName'), item.get('password')
+    elif fmt == 'csv':
+        # CSV files carry a header row naming the userPrincipalName and password columns
+        reader = csv.DictReader(f)
+        if not reader.fieldnames or 'userPrincipalName' not in reader.fieldnames:
+            raise ValueError("line 1: CSV header must contain a userPrincipalName column")
+        for row in reader:
+            yield reader.line_num, row.get('userPrincipalName'), row.get('password')
+    else:
+        # tab separated without a header: user, then password
+        for lineno, line in enumerate(f, 1):
+            line = line.rstrip('\r\n')
+            if not line.strip():
+                continue
+            fields = line.split('\t')
+            yield lineno, fields[0], fields[1] if len(fields) > 1 else None
+
+
+def read_user_rows(path, require_password=True, fmt=None):
+    """
+    Read the input file in a single pass and yield one UserRow per line.
+
+    Rows are produced lazily, so a file of any size is never held in memory;
+    blank lines are skipped and whitespace around the user principal name is
+    removed. Passwords are returned unchanged.
+
+    Args:
+        path: input file; users.txt style TSV, CSV with a header, or JSONL.
+        require_password: reject rows without a password.
+        fmt: 'tsv', 'csv' or 'jsonl'; detected from the extension when None.
+
+    Raises:
+        ValueError: for a malformed row, naming the file and line number.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported input format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        try:
+            for lineno, user, password in _raw_rows(f, fmt):
+                user = (user or '').strip()
+                # passwords are used exactly as given; only an empty one counts as missing
+                password = password if isinstance(password, str) and password != '' else None
+                if '@' not in user:
+                    raise ValueError(f"line {lineno}: {user!r} is not a user principal name")
+                if require_password and password is None:
+                    raise ValueError(f"line {lineno}: missing password for {user}")
+                yield UserRow(user, password)
+        except ValueError as e:
+            raise ValueError(f"{path}: {e}") from None